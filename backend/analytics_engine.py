@@ -0,0 +1,320 @@
+"""Vectorized repository scoring over columnar NumPy arrays
+
+Commit and PR documents are packed into compact column arrays (epoch-second
+timestamps, int32 counts, integer author codes) once per repository data
+version, and every health component and distribution is computed with
+whole-array passes instead of per-document Python loops.
+
+``python analytics_engine.py [--commits N] [--prs N] [--repeat N]`` benchmarks
+the engine against the previous per-document implementation on a synthetic
+repository and checks that both produce the same scores.
+"""
+import argparse
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+# Upper bounds (lines changed) of the PR size buckets; larger PRs are "xl"
+PR_SIZE_BUCKETS = (("xs", 10), ("s", 50), ("m", 250), ("l", 1000))
+
+
+@dataclass
+class CommitColumns:
+    timestamps: np.ndarray  # float64 epoch seconds
+    additions: np.ndarray  # int32
+    deletions: np.ndarray  # int32
+    author_codes: np.ndarray  # int32 index into authors, -1 when unknown
+    authors: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+@dataclass
+class PullRequestColumns:
+    created: np.ndarray  # float64 epoch seconds, NaN when unknown
+    merged: np.ndarray  # float64 epoch seconds, NaN when not merged
+    is_merged: np.ndarray  # bool, merged_at set or state "merged"
+    additions: np.ndarray  # int32
+    deletions: np.ndarray  # int32
+    comments: np.ndarray  # int32
+    changed_files: np.ndarray  # int32
+
+    def __len__(self) -> int:
+        return len(self.created)
+
+
+def _epoch(value) -> float:
+    """Epoch seconds of a datetime or ISO-8601 string; NaN when missing or unparseable.
+
+    Documents written before ``migrate_datetimes.py`` has run still hold
+    strings, and naive values are UTC.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return np.nan
+    if not isinstance(value, datetime):
+        return np.nan
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _int_column(docs: Sequence[Dict], key: str) -> np.ndarray:
+    return np.array([doc.get(key) or 0 for doc in docs], dtype=np.int32)
+
+
+def _time_column(docs: Sequence[Dict], key: str) -> np.ndarray:
+    return np.array([_epoch(doc.get(key)) for doc in docs], dtype=np.float64)
+
+
+def commit_columns(docs: Sequence[Dict]) -> CommitColumns:
+    """Pack commit documents (timestamp, author, additions, deletions) into columns"""
+    authors: Dict[str, int] = {}
+    codes = [authors.setdefault(doc["author"], len(authors)) if doc.get("author") else -1 for doc in docs]
+    return CommitColumns(
+        timestamps=_time_column(docs, "timestamp"),
+        additions=_int_column(docs, "additions"),
+        deletions=_int_column(docs, "deletions"),
+        author_codes=np.array(codes, dtype=np.int32),
+        authors=list(authors)
+    )
+
+
+def pr_columns(docs: Sequence[Dict]) -> PullRequestColumns:
+    """Pack pull request documents into columns"""
+    return PullRequestColumns(
+        created=_time_column(docs, "created_at"),
+        merged=_time_column(docs, "merged_at"),
+        is_merged=np.array([doc.get("state") == "merged" or bool(doc.get("merged_at")) for doc in docs], dtype=bool),
+        additions=_int_column(docs, "additions"),
+        deletions=_int_column(docs, "deletions"),
+        comments=_int_column(docs, "comments"),
+        changed_files=_int_column(docs, "changed_files")
+    )
+
+
+ColumnsT = TypeVar("ColumnsT", CommitColumns, PullRequestColumns)
+
+
+class ColumnCache(Generic[ColumnsT]):
+    """Small LRU of packed columns keyed by (repository_id, data_version).
+
+    Packing is the one per-document pass left, so it is paid once per data
+    version; rescoring the same data only costs the vectorized passes.
+    Commit and PR columns are cached separately, so a PR-only view never
+    loads the repository's commits.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], ColumnsT]" = OrderedDict()
+
+    def get(self, repository_id: str, data_version: int) -> Optional[ColumnsT]:
+        key = (repository_id, data_version)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, repository_id: str, data_version: int, columns: ColumnsT):
+        if self.max_entries <= 0:
+            return
+        # Older versions of the same repository can never be read again
+        for key in [k for k in self._entries if k[0] == repository_id]:
+            del self._entries[key]
+        self._entries[(repository_id, data_version)] = columns
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def _mean(values: np.ndarray) -> float:
+    # float64 accumulation: int32 sums over large repositories would overflow
+    return float(values.mean(dtype=np.float64))
+
+
+def health_components(commits: CommitColumns, prs: PullRequestColumns, now: Optional[datetime] = None) -> Dict[str, float]:
+    """All health score components, unrounded, keyed like the HealthScore fields"""
+    now = now or datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=30)).timestamp()
+
+    recent_commits = int(np.count_nonzero(commits.timestamps > cutoff))
+    commit_frequency_score = min(recent_commits / 30 * 10, 100)
+
+    if len(prs):
+        pr_velocity_score = min(int(np.count_nonzero(prs.is_merged)) / len(prs) * 100, 100)
+
+        avg_pr_size = _mean(prs.additions.astype(np.int64) + prs.deletions)
+        size_score = max(100 - (avg_pr_size / 10), 20)
+        review_score = min(_mean(prs.comments) * 15, 100)
+        focus_score = max(100 - (_mean(prs.changed_files) * 5), 30)
+        code_quality_score = size_score * 0.5 + review_score * 0.3 + focus_score * 0.2
+    else:
+        pr_velocity_score = 50
+        if len(commits):
+            avg_commit_size = _mean(commits.additions.astype(np.int64) + commits.deletions)
+            code_quality_score = max(100 - (avg_commit_size / 20), 40)
+        else:
+            code_quality_score = 50
+
+    known = commits.author_codes[commits.author_codes >= 0]
+    unique_authors = int(np.count_nonzero(np.bincount(known))) if known.size else 0
+    collaboration_score = min(unique_authors * 20, 100)
+
+    overall_score = (commit_frequency_score + pr_velocity_score + code_quality_score + collaboration_score) / 4
+    return {
+        "overall_score": overall_score,
+        "commit_frequency_score": commit_frequency_score,
+        "pr_velocity_score": pr_velocity_score,
+        "code_quality_score": code_quality_score,
+        "collaboration_score": collaboration_score
+    }
+
+
+def pr_distribution(prs: PullRequestColumns) -> Dict:
+    """Turnaround percentiles and PR size distribution"""
+    merged = prs.is_merged & ~np.isnan(prs.merged) & ~np.isnan(prs.created)
+    turnaround_hours = (prs.merged[merged] - prs.created[merged]) / 3600
+    sizes = prs.additions.astype(np.int64) + prs.deletions
+
+    def percentiles(values: np.ndarray) -> List[float]:
+        if not values.size:
+            return [0.0, 0.0]
+        return [round(float(p), 2) for p in np.percentile(values, [50, 90])]
+
+    turnaround_p50, turnaround_p90 = percentiles(turnaround_hours)
+    size_p50, size_p90 = percentiles(sizes)
+    bounds = [upper for _, upper in PR_SIZE_BUCKETS]
+    bucket_counts = np.bincount(np.searchsorted(bounds, sizes, side="right"), minlength=len(bounds) + 1)
+    labels = [name for name, _ in PR_SIZE_BUCKETS] + ["xl"]
+
+    return {
+        "turnaround_p50_hours": turnaround_p50,
+        "turnaround_p90_hours": turnaround_p90,
+        "size_p50": size_p50,
+        "size_p90": size_p90,
+        "size_distribution": {label: int(count) for label, count in zip(labels, bucket_counts)}
+    }
+
+
+def _reference_health(commits: List[Dict], prs: List[Dict], now: datetime) -> Dict[str, float]:
+    """The per-document scoring this engine replaces, kept for the benchmark"""
+    thirty_days_ago = now - timedelta(days=30)
+    recent_commits = [c for c in commits if c["timestamp"] > thirty_days_ago] if commits else []
+    commit_frequency_score = min(len(recent_commits) / 30 * 10, 100)
+
+    merged_prs = [pr for pr in prs if pr.get("state") == "merged" or pr.get("merged_at")]
+    pr_velocity_score = min(len(merged_prs) / max(len(prs), 1) * 100, 100) if prs else 50
+
+    if prs:
+        avg_pr_size = sum(pr.get("additions", 0) + pr.get("deletions", 0) for pr in prs) / len(prs)
+        size_score = max(100 - (avg_pr_size / 10), 20)
+        avg_comments = sum(pr.get("comments", 0) for pr in prs) / len(prs)
+        review_score = min(avg_comments * 15, 100)
+        avg_files_changed = sum(pr.get("changed_files", 0) for pr in prs) / len(prs)
+        focus_score = max(100 - (avg_files_changed * 5), 30)
+        code_quality_score = (size_score * 0.5 + review_score * 0.3 + focus_score * 0.2)
+    elif commits:
+        avg_commit_size = sum(c.get("additions", 0) + c.get("deletions", 0) for c in commits) / len(commits)
+        code_quality_score = max(100 - (avg_commit_size / 20), 40)
+    else:
+        code_quality_score = 50
+
+    unique_authors = set(c.get("author") for c in commits if c.get("author"))
+    collaboration_score = min(len(unique_authors) * 20, 100)
+
+    overall_score = (commit_frequency_score + pr_velocity_score + code_quality_score + collaboration_score) / 4
+    return {
+        "overall_score": overall_score,
+        "commit_frequency_score": commit_frequency_score,
+        "pr_velocity_score": pr_velocity_score,
+        "code_quality_score": code_quality_score,
+        "collaboration_score": collaboration_score
+    }
+
+
+def synthetic_repository(n_commits: int, n_prs: int, n_authors: int = 40, seed: int = 7) -> Tuple[List[Dict], List[Dict]]:
+    """Commit and PR documents shaped like the ones sync stores"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    authors = [f"author-{i}" for i in range(n_authors)]
+    commits = [
+        {
+            "timestamp": now - timedelta(seconds=rng.randint(0, 730 * 86400)),
+            "author": rng.choice(authors),
+            "additions": rng.randint(0, 400),
+            "deletions": rng.randint(0, 200)
+        }
+        for _ in range(n_commits)
+    ]
+    prs = []
+    for _ in range(n_prs):
+        created_at = now - timedelta(seconds=rng.randint(3600, 365 * 86400))
+        merged_at = created_at + timedelta(seconds=rng.randint(600, 14 * 86400)) if rng.random() < 0.7 else None
+        prs.append({
+            "state": "closed" if merged_at else rng.choice(["open", "closed"]),
+            "created_at": created_at,
+            "merged_at": merged_at,
+            "additions": rng.randint(0, 2000),
+            "deletions": rng.randint(0, 800),
+            "comments": rng.randint(0, 12),
+            "changed_files": rng.randint(1, 40)
+        })
+    return commits, prs
+
+
+def _best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def benchmark(n_commits: int = 100_000, n_prs: int = 10_000, repeat: int = 5) -> Dict:
+    commit_docs, pr_docs = synthetic_repository(n_commits, n_prs)
+    now = datetime.now(timezone.utc)
+
+    reference = _reference_health(commit_docs, pr_docs, now)
+    commits, prs = commit_columns(commit_docs), pr_columns(pr_docs)
+    vectorized = health_components(commits, prs, now)
+    mismatched = [k for k in reference if round(reference[k], 2) != round(vectorized[k], 2)]
+
+    return {
+        "commits": n_commits,
+        "prs": n_prs,
+        "reference_seconds": _best_of(repeat, lambda: _reference_health(commit_docs, pr_docs, now)),
+        "columnize_seconds": _best_of(repeat, lambda: (commit_columns(commit_docs), pr_columns(pr_docs))),
+        "vectorized_seconds": _best_of(repeat, lambda: (health_components(commits, prs, now), pr_distribution(prs))),
+        "mismatched_fields": mismatched
+    }
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized health scoring")
+    parser.add_argument("--commits", type=int, default=100_000)
+    parser.add_argument("--prs", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    result = benchmark(args.commits, args.prs, args.repeat)
+    print(f"{result['commits']} commits, {result['prs']} PRs (best of {args.repeat})")
+    print(f"  per-document scoring:  {result['reference_seconds'] * 1000:9.2f} ms")
+    print(f"  build columns (once):  {result['columnize_seconds'] * 1000:9.2f} ms")
+    print(f"  vectorized scoring:    {result['vectorized_seconds'] * 1000:9.2f} ms")
+    if result["mismatched_fields"]:
+        print(f"  MISMATCH: {', '.join(result['mismatched_fields'])}")
+        raise SystemExit(1)
+    print("  scores match")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,239 @@
+"""End-to-end sync and analytics benchmark against the local fake GitHub
+
+For each repository size, seeds a ``fake_github.FakeGitHub`` repository,
+runs ``sync_repository_data`` into a throwaway database, syncs again to time
+the no-change path, then times the analytics endpoints through the ASGI app.
+The results are printed (or written with ``--output``) as JSON, so runs from
+two releases can be diffed directly.
+
+    python bench_sync.py --sizes 1000,10000,100000
+    python bench_sync.py --mongomock --sizes 1000
+    python bench_sync.py --cache-mongo --sizes 10000
+
+Uses ``MONGO_URL`` with a ``<DB_NAME>_bench_<size>`` database that is dropped
+afterwards; ``--mongomock`` runs in memory instead (no DB op counts); its
+collection scans dominate the timings, so use it for API call counts rather
+than throughput. Commits are fetched in REST mode: the fake does not
+serve GraphQL.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+# The harness drives sync itself and must never call a real model
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'gitinsight')
+os.environ['SYNC_WORKERS'] = '0'
+os.environ['INSIGHTS_PROVIDER'] = 'stub'
+os.environ['GITHUB_COMMIT_FETCH_MODE'] = 'rest'
+
+import metrics  # noqa: E402
+import server  # noqa: E402
+from db_indexes import ensure_indexes  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+
+def _counter_total(counter: metrics.Counter) -> float:
+    with metrics._lock:
+        return sum(counter._values.values())
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def use_database(db, cache_mongo: bool = False):
+    """Point the app module and its services at ``db``.
+
+    The response cache gets the MongoDB tier only with ``cache_mongo``, the
+    way the server only attaches it with ``GITHUB_CACHE_MONGO=true``.
+    """
+    server.db = db
+    server.sync_queue.collection = db.sync_jobs
+    server.insights_service.collection = db.insights_cache
+    server.github_service.cache = ResponseCache(server.github_service.cache.max_entries, server.github_service.cache.max_bytes)
+    if cache_mongo:
+        server.github_service.cache.attach_collection(db.github_response_cache)
+    server.overview_cache.clear()
+    server.user_cache.clear()
+
+
+async def timed_sync(repo_id: str, user_id: str, fake: Optional[FakeGitHub]) -> Dict:
+    if fake is not None:
+        fake.reset_stats()
+    github_before = _counter_total(metrics.GITHUB_REQUESTS)
+    mongo_before = _counter_total(metrics.MONGO_OPERATIONS)
+    started = time.perf_counter()
+    complete = await server.sync_repository_data(repo_id, user_id)
+    elapsed = time.perf_counter() - started
+    return {
+        "complete": bool(complete),
+        "seconds": round(elapsed, 4),
+        "api_calls": int(_counter_total(metrics.GITHUB_REQUESTS) - github_before),
+        "api_calls_by_kind": dict(sorted(fake.calls.items())) if fake is not None else None,
+        "db_ops": int(_counter_total(metrics.MONGO_OPERATIONS) - mongo_before)
+    }
+
+
+async def time_endpoints(repo_id: str, token: str, repeat: int) -> Dict[str, Dict]:
+    endpoints = {
+        "overview": "/api/analytics/overview",
+        "commit_analytics": f"/api/analytics/commits/{repo_id}",
+        "pr_analytics": f"/api/analytics/pull-requests/{repo_id}",
+        "health": f"/api/analytics/health/{repo_id}",
+        "list_commits": f"/api/repositories/{repo_id}/commits?limit=100",
+        "list_pull_requests": f"/api/repositories/{repo_id}/pull-requests?limit=100"
+    }
+    results = {}
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, path in endpoints.items():
+            samples = []
+            for _ in range(repeat + 1):
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                samples.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+            # The first request pays for cold caches; report it separately
+            first, rest = samples[0], samples[1:]
+            results[name] = {
+                "first_ms": round(first, 3),
+                "p50_ms": round(percentile(rest, 0.5), 3),
+                "p99_ms": round(percentile(rest, 0.99), 3)
+            }
+    return results
+
+
+async def run_size(commits: int, prs: int, args, mongomock_client) -> Dict:
+    fake = None
+    if args.github_url:
+        server.github_service.BASE_URL = args.github_url.rstrip('/')
+    else:
+        fake = FakeGitHub(repos=1, commits=commits, prs=prs, seed=args.seed, latency=args.latency)
+        await server.github_service.close()
+        server.github_service._client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=fake.app), timeout=None
+        )
+
+    db_name = f"{os.environ['DB_NAME']}_bench_{commits}"
+    client = mongomock_client or server.client
+    await client.drop_database(db_name)
+    db = client[db_name]
+    use_database(db, args.cache_mongo)
+    await ensure_indexes(db)
+
+    user = server.User(email="bench@example.com", name="Bench", github_token="bench-token", github_username="bench")
+    user_dict = user.model_dump()
+    await db.users.insert_one(dict(user_dict))
+    summary = fake.repos["repo-0"].summary() if fake else await server.github_service.get_repo("bench-token", "bench", "repo-0")
+    repo = server.Repository(
+        user_id=user.id,
+        github_id=summary["id"],
+        name=summary["name"],
+        full_name=summary["full_name"],
+        owner=summary["owner"]["login"],
+        description=summary.get("description"),
+        url=summary["html_url"],
+        is_private=summary["private"],
+        language=summary.get("language")
+    )
+    await db.repositories.insert_one(repo.model_dump())
+
+    try:
+        initial = await timed_sync(repo.id, user.id, fake)
+        items = await db.commits.count_documents({"repository_id": repo.id}) + await db.pull_requests.count_documents({"repository_id": repo.id})
+        initial["items"] = items
+        initial["items_per_sec"] = round(items / initial["seconds"], 1) if initial["seconds"] else None
+        resync = await timed_sync(repo.id, user.id, fake)
+
+        token = server.create_access_token(server.token_claims(user_dict))
+        endpoints = await time_endpoints(repo.id, token, args.repeat)
+    finally:
+        await client.drop_database(db_name)
+
+    if mongomock_client is not None:
+        initial["db_ops"] = resync["db_ops"] = None
+    return {"commits": commits, "prs": prs, "sync": initial, "resync": resync, "endpoints": endpoints}
+
+
+async def run(args) -> Dict:
+    mongomock_client = None
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        mongomock_client = AsyncMongoMockClient(tz_aware=True)
+
+    runs = []
+    for commits in args.sizes:
+        prs = args.prs if args.prs is not None else max(commits // 10, 1)
+        print(f"Benchmarking {commits} commits / {prs} pull requests", file=sys.stderr)
+        runs.append(await run_size(commits, prs, args, mongomock_client))
+    await server.github_service.close()
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "backend": "mongomock" if args.mongomock else "mongodb",
+        "github": args.github_url or "fake_github",
+        "github_latency_seconds": args.latency,
+        "response_cache_mongo": args.cache_mongo,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "runs": runs
+    }
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Benchmark repository sync and analytics endpoints")
+    parser.add_argument("--sizes", type=lambda s: [int(v) for v in s.split(",")], default=[1000, 10_000, 100_000],
+                        help="comma-separated commit counts")
+    parser.add_argument("--prs", type=int, default=None, help="pull requests per repository (default: commits / 10)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the fake adds to every GitHub response")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=50, help="timed requests per endpoint")
+    parser.add_argument("--mongomock", action="store_true", help="use an in-memory database instead of MONGO_URL")
+    parser.add_argument("--cache-mongo", action="store_true",
+                        help="give the GitHub response cache its MongoDB tier, like GITHUB_CACHE_MONGO=true")
+    parser.add_argument("--github-url", default=None,
+                        help="use an already running fake_github.py (serving bench/repo-0) instead of an in-process one")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Sync reports progress with print(); keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(run(args))
+    report = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    _main()
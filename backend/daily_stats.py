@@ -0,0 +1,193 @@
+"""Per-repository daily rollup of commit and pull request activity
+
+``repo_daily_stats`` holds one row per (repository_id, day) with:
+
+* ``commits``, ``additions``, ``deletions`` and ``authors`` (distinct names)
+* ``prs_opened`` and ``pr_size_sum``, bucketed by PR creation day
+* ``prs_merged`` and ``turnaround_hours_sum``, bucketed by merge day
+
+Sync applies ``$inc`` deltas for the data it inserts, so the analytics
+endpoints read O(days) rows instead of rescanning raw commits and PRs.
+``python daily_stats.py`` rebuilds the rollup from the raw collections; the
+server rebuilds repositories that never had one at startup. A rebuild needs
+native datetimes, so it refuses to run until ``migrate_datetimes.py`` has.
+"""
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+
+def day_of(value: datetime) -> datetime:
+    """Midnight UTC of the day a timestamp falls on"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_ops(repository_id: str, rows: Dict[datetime, Dict]) -> List[UpdateOne]:
+    operations = []
+    for day, row in rows.items():
+        update = {"$inc": row["inc"]}
+        if row.get("authors"):
+            update["$addToSet"] = {"authors": {"$each": sorted(row["authors"])}}
+        operations.append(UpdateOne({"repository_id": repository_id, "day": day}, update, upsert=True))
+    return operations
+
+
+def commit_rollup_ops(repository_id: str, commits: Iterable[Dict]) -> List[UpdateOne]:
+    """Rollup deltas for newly inserted commits"""
+    rows = defaultdict(lambda: {"inc": defaultdict(int), "authors": set()})
+    for commit in commits:
+        row = rows[day_of(commit["timestamp"])]
+        row["inc"]["commits"] += 1
+        row["inc"]["additions"] += commit.get("additions", 0)
+        row["inc"]["deletions"] += commit.get("deletions", 0)
+        if commit.get("author"):
+            row["authors"].add(commit["author"])
+    return _rollup_ops(repository_id, rows)
+
+
+def pr_rollup_ops(repository_id: str, opened: Iterable[Dict], merged: Iterable[Dict]) -> List[UpdateOne]:
+    """Rollup deltas for newly seen PRs and PRs that were merged since the last sync"""
+    rows = defaultdict(lambda: {"inc": defaultdict(int)})
+    for pr in opened:
+        row = rows[day_of(pr["created_at"])]
+        row["inc"]["prs_opened"] += 1
+        row["inc"]["pr_size_sum"] += pr.get("additions", 0) + pr.get("deletions", 0)
+    for pr in merged:
+        row = rows[day_of(pr["merged_at"])]
+        row["inc"]["prs_merged"] += 1
+        row["inc"]["turnaround_hours_sum"] += (pr["merged_at"] - pr["created_at"]).total_seconds() / 3600
+    return _rollup_ops(repository_id, rows)
+
+
+async def apply_ops(db, operations: List[UpdateOne]):
+    if operations:
+        await db.repo_daily_stats.bulk_write(operations, ordered=False)
+
+
+class UnmigratedTimestamps(Exception):
+    """Raw documents still hold ISO-string timestamps, which cannot be bucketed by day"""
+
+    def __init__(self, repository_id: str, fields: List[str]):
+        self.repository_id = repository_id
+        self.fields = fields
+        super().__init__(
+            f"Cannot rebuild daily stats for repository {repository_id}: {', '.join(fields)} still hold "
+            f"ISO strings; run migrate_datetimes.py first"
+        )
+
+
+# Timestamps the rebuild groups on
+REBUILD_FIELDS = {"commits": ["timestamp"], "pull_requests": ["created_at", "merged_at"]}
+
+
+async def unmigrated_fields(db, repository_id: str) -> List[str]:
+    """``collection.field`` names that still hold strings for the repository"""
+    found = []
+    for collection, fields in REBUILD_FIELDS.items():
+        for field in fields:
+            if await db[collection].find_one({"repository_id": repository_id, field: {"$type": "string"}}, {"_id": 1}):
+                found.append(f"{collection}.{field}")
+    return found
+
+
+def _day(field: str) -> Dict:
+    # Midnight UTC, like day_of(); $dateFromParts also runs on servers older than $dateTrunc
+    return {"$dateFromParts": {
+        "year": {"$year": field},
+        "month": {"$month": field},
+        "day": {"$dayOfMonth": field}
+    }}
+
+
+async def rebuild(db, repository_id: str):
+    """Recompute a repository's rollup from its raw commits and PRs.
+
+    Raises UnmigratedTimestamps, before touching the rollup, while any of the
+    raw timestamps are still strings.
+    """
+    unmigrated = await unmigrated_fields(db, repository_id)
+    if unmigrated:
+        raise UnmigratedTimestamps(repository_id, unmigrated)
+
+    rows = defaultdict(dict)
+
+    async def collect(collection, pipeline: List[Dict]):
+        async for group in collection.aggregate(pipeline):
+            rows[day_of(group.pop("_id"))].update(group)
+
+    await collect(db.commits, [
+        {"$match": {"repository_id": repository_id}},
+        {"$group": {
+            "_id": _day("$timestamp"),
+            "commits": {"$sum": 1},
+            "additions": {"$sum": {"$ifNull": ["$additions", 0]}},
+            "deletions": {"$sum": {"$ifNull": ["$deletions", 0]}},
+            "authors": {"$addToSet": "$author"}
+        }}
+    ])
+    await collect(db.pull_requests, [
+        {"$match": {"repository_id": repository_id}},
+        {"$group": {
+            "_id": _day("$created_at"),
+            "prs_opened": {"$sum": 1},
+            "pr_size_sum": {"$sum": {"$add": [{"$ifNull": ["$additions", 0]}, {"$ifNull": ["$deletions", 0]}]}}
+        }}
+    ])
+    await collect(db.pull_requests, [
+        {"$match": {"repository_id": repository_id, "merged_at": {"$ne": None}}},
+        {"$group": {
+            "_id": _day("$merged_at"),
+            "prs_merged": {"$sum": 1},
+            "turnaround_hours_sum": {"$sum": {"$divide": [{"$subtract": ["$merged_at", "$created_at"]}, 3600 * 1000]}}
+        }}
+    ])
+
+    # One row per active day, so the rewrite is small whatever the repository size
+    await db.repo_daily_stats.delete_many({"repository_id": repository_id})
+    await apply_ops(db, [
+        UpdateOne({"repository_id": repository_id, "day": day}, {"$set": row}, upsert=True)
+        for day, row in rows.items()
+    ])
+    await db.repositories.update_one({"id": repository_id}, {"$set": {"daily_stats_ready": True}})
+
+
+async def rebuild_pending(db):
+    """Rebuild every repository whose rollup was never built, stopping at unmigrated data"""
+    async for repo in db.repositories.find({"daily_stats_ready": {"$ne": True}}, {"_id": 0, "id": 1}):
+        await rebuild(db, repo["id"])
+
+
+async def read_rows(db, repository_id: str, since: Optional[datetime] = None) -> List[Dict]:
+    query = {"repository_id": repository_id}
+    if since is not None:
+        query["day"] = {"$gte": day_of(since)}
+    return await db.repo_daily_stats.find(query, {"_id": 0, "repository_id": 0}).sort("day", 1).to_list(None)
+
+
+async def _main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    try:
+        async for repo in db.repositories.find({}, {"_id": 0, "id": 1, "full_name": 1}):
+            await rebuild(db, repo["id"])
+            print(f"Rebuilt daily stats for {repo.get('full_name', repo['id'])}")
+    except UnmigratedTimestamps as e:
+        raise SystemExit(str(e))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,149 @@
+"""MongoDB index provisioning and hot-query diagnostics
+
+Run ``python db_indexes.py`` to create the indexes, or
+``python db_indexes.py --explain`` to also print a plan report for every
+hot query and exit non-zero if any of them still scans a collection.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from insights import INSIGHTS_CACHE_INDEXES
+from response_cache import RESPONSE_CACHE_INDEXES
+from sync_queue import SYNC_JOB_INDEXES
+from webhooks import WEBHOOK_DELIVERY_INDEXES
+
+logger = logging.getLogger(__name__)
+
+# Indexes backing the lookups and sorts in server.py, per collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)]),
+        IndexModel([("github_id", ASCENDING)]),
+    ],
+    "repositories": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("github_id", ASCENDING)]),
+    ],
+    "commits": [
+        IndexModel([("repository_id", ASCENDING), ("sha", ASCENDING)], unique=True),
+        # sha breaks timestamp ties for keyset pagination
+        IndexModel([("repository_id", ASCENDING), ("timestamp", DESCENDING), ("sha", DESCENDING)]),
+    ],
+    "pull_requests": [
+        IndexModel([("github_id", ASCENDING)], unique=True),
+        IndexModel([("repository_id", ASCENDING), ("created_at", DESCENDING), ("github_id", DESCENDING)]),
+        IndexModel([("repository_id", ASCENDING), ("state", ASCENDING)]),
+    ],
+    "repo_daily_stats": [
+        IndexModel([("repository_id", ASCENDING), ("day", ASCENDING)], unique=True),
+    ],
+    "health_scores": [
+        IndexModel([("repository_id", ASCENDING), ("computed_at", DESCENDING)]),
+    ],
+    "sync_jobs": SYNC_JOB_INDEXES,
+    "insights_cache": INSIGHTS_CACHE_INDEXES,
+    "github_response_cache": RESPONSE_CACHE_INDEXES,
+    "webhook_deliveries": WEBHOOK_DELIVERY_INDEXES,
+}
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every index in INDEXES; safe to run on each startup.
+
+    A failure on one collection (for example duplicates blocking a unique
+    index on old data) is logged and does not stop the others.
+    """
+    created = {}
+    for collection_name, indexes in INDEXES.items():
+        try:
+            created[collection_name] = await db[collection_name].create_indexes(indexes)
+        except Exception as e:
+            logger.error(f"Failed to create indexes on {collection_name}: {e}")
+    return created
+
+
+def _hot_queries(db) -> List[Dict[str, Any]]:
+    """The per-request queries from server.py, with placeholder values"""
+    sample = "00000000-0000-0000-0000-000000000000"
+    return [
+        {"name": "get_current_user", "cursor": db.users.find({"id": sample}).limit(1)},
+        {"name": "login", "cursor": db.users.find({"email": "user@example.com"}).limit(1)},
+        {"name": "get_repositories", "cursor": db.repositories.find({"user_id": sample}).sort([("created_at", 1), ("id", 1)]).limit(100)},
+        {"name": "get_repository", "cursor": db.repositories.find({"id": sample, "user_id": sample}).limit(1)},
+        {
+            "name": "commit_analytics",
+            "cursor": db.commits.find({"repository_id": sample}).sort("timestamp", DESCENDING)
+        },
+        {
+            "name": "list_commits",
+            "cursor": db.commits.find({"repository_id": sample}).sort([("timestamp", DESCENDING), ("sha", DESCENDING)]).limit(100)
+        },
+        {
+            "name": "list_pull_requests",
+            "cursor": db.pull_requests.find({"repository_id": sample}).sort([("created_at", DESCENDING), ("github_id", DESCENDING)]).limit(100)
+        },
+        {"name": "open_pull_requests", "cursor": db.pull_requests.find({"repository_id": sample, "state": "open"})},
+        {"name": "daily_stats", "cursor": db.repo_daily_stats.find({"repository_id": sample}).sort("day", ASCENDING)},
+        {
+            "name": "latest_health_score",
+            "cursor": db.health_scores.find({"repository_id": sample}).sort("computed_at", DESCENDING).limit(1)
+        },
+        {"name": "github_response_cache", "cursor": db.github_response_cache.find({"key": sample}).limit(1)},
+    ]
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return [s for s in stages if s]
+
+
+async def explain_hot_queries(db) -> List[Dict[str, Any]]:
+    """Run explain() on each hot query and flag the ones using a COLLSCAN"""
+    report = []
+    for query in _hot_queries(db):
+        try:
+            explain = await query["cursor"].explain()
+            stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+            report.append({
+                "query": query["name"],
+                "stages": stages,
+                "collection_scan": "COLLSCAN" in stages
+            })
+        except Exception as e:
+            report.append({"query": query["name"], "error": str(e)})
+    return report
+
+
+async def _main(explain: bool) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        print(json.dumps(await ensure_indexes(db), indent=2))
+        if not explain:
+            return 0
+        report = await explain_hot_queries(db)
+        print(json.dumps(report, indent=2))
+        return 1 if any(r.get("collection_scan") for r in report) else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main("--explain" in sys.argv[1:])))
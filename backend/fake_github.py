@@ -0,0 +1,261 @@
+"""Local stand-in for the parts of the GitHub REST API that sync uses
+
+Serves ``/user``, ``/user/repos``, ``/repos/{owner}/{repo}``, the commit
+listing and detail endpoints and ``/pulls`` from seeded synthetic
+repositories, with ``Link`` pagination, ETags (and 304s), ``X-RateLimit-*``
+headers, 403s once a token's budget is spent, and optional per-request
+latency.
+
+Use it in-process through ``httpx.ASGITransport(app=FakeGitHub(...).app)``,
+or run ``python fake_github.py --port 8900`` and point the backend at it with
+``GITHUB_API_URL=http://localhost:8900``.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, Request, Response
+
+AUTHORS = [f"developer-{i}" for i in range(25)]
+
+
+def _iso(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class SyntheticRepository:
+    """A repository with ``commits`` commits and ``prs`` pull requests, newest first"""
+
+    def __init__(self, github_id: int, owner: str, name: str, commits: int, prs: int, seed: int, now: datetime):
+        self.github_id = github_id
+        self.owner = owner
+        self.name = name
+        rng = random.Random(f"{seed}-{name}")
+        span = timedelta(days=365).total_seconds()
+
+        self.commits: List[Dict] = []
+        self.details: Dict[str, Dict] = {}
+        for i in range(commits):
+            sha = hashlib.sha1(f"{seed}-{name}-{i}".encode()).hexdigest()
+            committed_at = now - timedelta(seconds=span * i / max(commits, 1))
+            author = rng.choice(AUTHORS)
+            self.commits.append({
+                "sha": sha,
+                "commit": {
+                    "author": {"name": author, "email": f"{author}@example.com", "date": _iso(committed_at)},
+                    "committer": {"name": author, "email": f"{author}@example.com", "date": _iso(committed_at)},
+                    "message": f"Change {i} in {name}"
+                },
+                "html_url": f"https://github.com/{owner}/{name}/commit/{sha}"
+            })
+            additions, deletions = rng.randint(0, 400), rng.randint(0, 200)
+            self.details[sha] = {
+                "sha": sha,
+                "stats": {"additions": additions, "deletions": deletions, "total": additions + deletions},
+                "files": [{"filename": f"src/module_{j}.py"} for j in range(rng.randint(1, 8))]
+            }
+        # Ascending commit times for the since filter
+        self._commit_times = [datetime.fromisoformat(c["commit"]["committer"]["date"].replace("Z", "+00:00")) for c in reversed(self.commits)]
+
+        self.pulls: List[Dict] = []
+        for number in range(prs, 0, -1):
+            created_at = now - timedelta(seconds=span * (prs - number + 1) / max(prs, 1))
+            merged_at = created_at + timedelta(hours=rng.randint(1, 240)) if rng.random() < 0.7 else None
+            if merged_at and merged_at > now:
+                merged_at = now
+            closed_at = merged_at or (created_at + timedelta(days=rng.randint(1, 30)) if rng.random() < 0.3 else None)
+            if closed_at and closed_at > now:
+                closed_at = None
+            self.pulls.append({
+                "id": github_id * 1_000_000 + number,
+                "number": number,
+                "title": f"Pull request {number}",
+                "user": {"login": rng.choice(AUTHORS)},
+                "state": "closed" if closed_at else "open",
+                "created_at": _iso(created_at),
+                "updated_at": _iso(closed_at or created_at),
+                "closed_at": _iso(closed_at) if closed_at else None,
+                "merged_at": _iso(merged_at) if merged_at else None,
+                "html_url": f"https://github.com/{owner}/{name}/pull/{number}"
+            })
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.github_id,
+            "name": self.name,
+            "full_name": f"{self.owner}/{self.name}",
+            "owner": {"login": self.owner},
+            "description": f"Synthetic repository {self.name}",
+            "html_url": f"https://github.com/{self.owner}/{self.name}",
+            "private": False,
+            "language": "Python",
+            "stargazers_count": 0,
+            "forks_count": 0,
+            "default_branch": "main"
+        }
+
+    def commits_since(self, since: Optional[str]) -> List[Dict]:
+        if not since:
+            return self.commits
+        cutoff = datetime.fromisoformat(since.replace("Z", "+00:00"))
+        # Commits at or after the cutoff are the newest len - (index of first one after it)
+        older = bisect_right(self._commit_times, cutoff - timedelta(microseconds=1))
+        return self.commits[:len(self.commits) - older]
+
+
+class FakeGitHub:
+    def __init__(
+        self,
+        repos: int = 1,
+        commits: int = 1000,
+        prs: int = 100,
+        seed: int = 1,
+        latency: float = 0.0,
+        rate_limit: int = 1_000_000,
+        owner: str = "bench"
+    ):
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.repos = {
+            f"repo-{i}": SyntheticRepository(1000 + i, owner, f"repo-{i}", commits, prs, seed, now)
+            for i in range(repos)
+        }
+        self.owner = owner
+        self.calls: Counter = Counter()
+        self._budgets: Dict[str, Dict] = {}
+        self.app = self._build_app()
+
+    def reset_stats(self):
+        self.calls.clear()
+
+    def _rate_headers(self, token: str, counted: bool) -> Dict[str, str]:
+        budget = self._budgets.get(token)
+        now = time.time()
+        if budget is None or budget["reset"] <= now:
+            budget = self._budgets[token] = {"remaining": self.rate_limit, "reset": int(now) + 3600}
+        if counted and budget["remaining"] > 0:
+            budget["remaining"] -= 1
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(budget["remaining"]),
+            "X-RateLimit-Reset": str(budget["reset"])
+        }
+
+    async def _respond(self, request: Request, kind: str, body, link_items: Optional[List] = None) -> Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        token = request.headers.get("authorization", "")
+        budget = self._budgets.get(token)
+        if budget is not None and budget["remaining"] <= 0 and budget["reset"] > time.time():
+            self.calls["rate_limited"] += 1
+            return Response(
+                json.dumps({"message": "API rate limit exceeded"}),
+                status_code=403,
+                media_type="application/json",
+                headers=self._rate_headers(token, counted=False)
+            )
+
+        headers = {}
+        if link_items is not None:
+            body, headers["Link"] = self._paginate(request, link_items)
+            if not headers["Link"]:
+                del headers["Link"]
+        if body is None:
+            self.calls["not_found"] += 1
+            return Response(json.dumps({"message": "Not Found"}), status_code=404, media_type="application/json",
+                            headers=self._rate_headers(token, counted=True))
+
+        payload = json.dumps(body)
+        etag = f'W/"{hashlib.sha1(payload.encode()).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            # Conditional requests that match do not count against the budget
+            self.calls["not_modified"] += 1
+            return Response(status_code=304, headers={"ETag": etag, **self._rate_headers(token, counted=False)})
+
+        self.calls[kind] += 1
+        headers.update({"ETag": etag, **self._rate_headers(token, counted=True)})
+        return Response(payload, media_type="application/json", headers=headers)
+
+    @staticmethod
+    def _paginate(request: Request, items: List):
+        per_page = min(int(request.query_params.get("per_page", "30")), 100)
+        page = max(int(request.query_params.get("page", "1")), 1)
+        last_page = max((len(items) + per_page - 1) // per_page, 1)
+        links = []
+        base = str(request.url).split("?")[0]
+        params = dict(request.query_params)
+        if page < last_page:
+            links.append(f'<{base}?{urlencode({**params, "page": page + 1})}>; rel="next"')
+            links.append(f'<{base}?{urlencode({**params, "page": last_page})}>; rel="last"')
+        return items[(page - 1) * per_page:page * per_page], ", ".join(links)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="fake-github")
+
+        @app.get("/user")
+        async def user(request: Request):
+            return await self._respond(request, "user", {"id": 1, "login": self.owner, "name": self.owner, "email": None})
+
+        @app.get("/user/repos")
+        async def user_repos(request: Request):
+            return await self._respond(request, "repos", None, [r.summary() for r in self.repos.values()])
+
+        @app.get("/repos/{owner}/{name}")
+        async def repo(request: Request, owner: str, name: str):
+            found = self.repos.get(name)
+            return await self._respond(request, "repo", found.summary() if found and owner == self.owner else None)
+
+        @app.get("/repos/{owner}/{name}/commits")
+        async def commits(request: Request, owner: str, name: str):
+            found = self.repos.get(name)
+            if not found:
+                return await self._respond(request, "commits", None)
+            return await self._respond(request, "commits", None, found.commits_since(request.query_params.get("since")))
+
+        @app.get("/repos/{owner}/{name}/commits/{sha}")
+        async def commit(request: Request, owner: str, name: str, sha: str):
+            found = self.repos.get(name)
+            return await self._respond(request, "commit", found.details.get(sha) if found else None)
+
+        @app.get("/repos/{owner}/{name}/pulls")
+        async def pulls(request: Request, owner: str, name: str):
+            found = self.repos.get(name)
+            if not found:
+                return await self._respond(request, "pulls", None)
+            state = request.query_params.get("state", "open")
+            items = [p for p in found.pulls if state == "all" or p["state"] == state]
+            sort_key = "updated_at" if request.query_params.get("sort") == "updated" else "created_at"
+            items = sorted(items, key=lambda p: p[sort_key], reverse=request.query_params.get("direction", "desc") == "desc")
+            return await self._respond(request, "pulls", None, items)
+
+        return app
+
+
+def _main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve synthetic repositories over a GitHub-like REST API")
+    parser.add_argument("--repos", type=int, default=1)
+    parser.add_argument("--commits", type=int, default=1000)
+    parser.add_argument("--prs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="requests per token per hour")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    fake = FakeGitHub(args.repos, args.commits, args.prs, args.seed, args.latency, args.rate_limit)
+    uvicorn.run(fake.app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,22 +1,230 @@
 """GitHub API service for fetching repository data"""
+import asyncio
+import hashlib
+import time
 import httpx
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable, AsyncIterator
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from urllib.parse import urlsplit
+from response_cache import ResponseCache
+from rate_limiter import RateLimitScheduler, RateLimitExceeded
+import metrics
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+COMMIT_HISTORY_QUERY = """
+query($owner: String!, $name: String!, $since: GitTimestamp, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: 100, since: $since, after: $cursor) {
+            pageInfo { hasNextPage endCursor }
+            nodes {
+              oid
+              url
+              message
+              committedDate
+              additions
+              deletions
+              changedFilesIfAvailable
+              author { name email date }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
 class GitHubService:
     BASE_URL = "https://api.github.com"
+    GRAPHQL_URL = "https://api.github.com/graphql"
     OAUTH_URL = "https://github.com/login/oauth"
     
     def __init__(self):
+        # Overridable to point at GitHub Enterprise or the local fake_github server
+        self.BASE_URL = os.environ.get('GITHUB_API_URL', GitHubService.BASE_URL).rstrip('/')
+        self.GRAPHQL_URL = os.environ.get('GITHUB_GRAPHQL_URL', f"{self.BASE_URL}/graphql")
         self.client_id = os.environ.get('GITHUB_CLIENT_ID')
         self.client_secret = os.environ.get('GITHUB_CLIENT_SECRET')
         self.frontend_url = os.environ.get('FRONTEND_URL')
+        self.http2 = os.environ.get('GITHUB_HTTP2', 'true').lower() == 'true'
+        self.max_connections = int(os.environ.get('GITHUB_MAX_CONNECTIONS', '20'))
+        # Below max_connections so api.github.com traffic cannot starve the OAuth calls to github.com
+        self.max_connections_per_host = int(os.environ.get('GITHUB_MAX_CONNECTIONS_PER_HOST', '16'))
+        self.max_keepalive_connections = int(os.environ.get('GITHUB_MAX_KEEPALIVE', '10'))
+        self.keepalive_expiry = float(os.environ.get('GITHUB_KEEPALIVE_EXPIRY', '30'))
+        # 0 means no page budget; callers can still pass max_pages/max_items
+        self.max_pages = int(os.environ.get('GITHUB_MAX_PAGES', '0'))
+        # "rest" fetches one detail call per commit, "graphql" gets stats in batches of 100
+        self.commit_fetch_mode = os.environ.get('GITHUB_COMMIT_FETCH_MODE', 'rest').lower()
+        self.per_token_concurrency = int(os.environ.get('GITHUB_PER_TOKEN_CONCURRENCY', '8'))
+        self.cache = ResponseCache(
+            int(os.environ.get('GITHUB_CACHE_SIZE', '1024')),
+            int(os.environ.get('GITHUB_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+        )
+        self.scheduler = RateLimitScheduler(
+            reserve=int(os.environ.get('GITHUB_RATE_LIMIT_RESERVE', '100')),
+            max_retries=int(os.environ.get('GITHUB_MAX_RETRIES', '3'))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._token_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled client shared by every GitHub call"""
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                http2 = False
+        
+        # max_connections bounds the whole pool, shared by api.github.com and
+        # github.com; _send adds the per-host cap on top
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=httpx.Timeout(30.0, connect=10.0)
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, created on first use if startup() was not called"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+    
+    async def startup(self):
+        """Open the pooled client (called from the app startup hook)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+    
+    async def close(self):
+        """Close the pooled client and its connections"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+    
+    @staticmethod
+    def token_key(token: str) -> str:
+        """Stable identity for a token that never keeps the raw secret around"""
+        return hashlib.sha256(token.encode()).hexdigest()[:16]
+    
+    def _token_semaphore(self, token: str) -> asyncio.Semaphore:
+        key = self.token_key(token)
+        semaphore = self._token_semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_token_concurrency)
+            self._token_semaphores[key] = semaphore
+        return semaphore
+    
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    def _headers(self, token: str) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+    
+    async def _send(self, token_key: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request under the rate-limit scheduler, retrying with backoff"""
+        resource = self._rate_limit_resource(url)
+        for attempt in range(self.scheduler.max_retries + 1):
+            await self.scheduler.acquire(token_key, url, resource=resource)
+            # Requests in flight per host: the connections HTTP/1.1 opens, or streams on HTTP/2
+            async with self._host_semaphore(url):
+                started = time.perf_counter()
+                response = await self.client.request(method, url, **kwargs)
+            self._observe(token_key, url, response, time.perf_counter() - started)
+            self.scheduler.record(token_key, response, resource)
+            if not self.scheduler.is_retryable(response):
+                break
+            if attempt == self.scheduler.max_retries:
+                if self.scheduler.is_rate_limited(response):
+                    raise RateLimitExceeded(url, self.scheduler.budget(token_key, resource).blocked_until or None)
+                break
+            await asyncio.sleep(self.scheduler.backoff(attempt))
+        return response
+    
+    def _rate_limit_resource(self, url: str) -> str:
+        """The GitHub rate-limit bucket a request is metered against"""
+        return "graphql" if url == self.GRAPHQL_URL else "core"
+    
+    def _observe(self, token_key: str, url: str, response: httpx.Response, elapsed: float):
+        api = "graphql" if url == self.GRAPHQL_URL else "rest"
+        metrics.GITHUB_REQUESTS.inc(api=api, status=response.status_code)
+        metrics.GITHUB_LATENCY.observe(elapsed, api=api)
+        remaining = response.headers.get("x-ratelimit-remaining")
+        if remaining is not None:
+            metrics.GITHUB_RATE_LIMIT_REMAINING.set(
+                int(remaining),
+                token=token_key,
+                resource=response.headers.get("x-ratelimit-resource", self._rate_limit_resource(url))
+            )
+    
+    async def _get(
+        self,
+        token: str,
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        cache: bool = True
+    ) -> httpx.Response:
+        """GET through the validator cache and the rate-limit scheduler.
+        
+        Cached ETag/Last-Modified values are sent as conditional headers and a
+        304 is turned back into the cached 200 response, so callers never see
+        it. A caller that sets its own If-None-Match gets the raw 304 instead.
+        ``cache=False`` skips the cache for responses that are never
+        requested again.
+        Rate-limited and 5xx responses are retried with backoff; if GitHub is
+        still refusing after the last retry RateLimitExceeded is raised rather
+        than handing back an empty result.
+        """
+        request_headers = self._headers(token)
+        if headers:
+            request_headers.update(headers)
+        caller_validates = "If-None-Match" in request_headers
+        
+        token_key = self.token_key(token)
+        key = self.cache.make_key(token_key, url, params)
+        cached = await self.cache.get(key) if cache else None
+        if cached and not caller_validates:
+            if cached["headers"].get("etag"):
+                request_headers["If-None-Match"] = cached["headers"]["etag"]
+            if cached["headers"].get("last-modified"):
+                request_headers["If-Modified-Since"] = cached["headers"]["last-modified"]
+        
+        response = await self._send(token_key, "GET", url, headers=request_headers, params=params)
+        
+        if response.status_code == 304 and cached and not caller_validates:
+            return httpx.Response(
+                200,
+                headers=cached["headers"],
+                content=cached["body"],
+                request=response.request
+            )
+        if cache and response.status_code == 200 and ("etag" in response.headers or "last-modified" in response.headers):
+            await self.cache.set(key, dict(response.headers), response.content)
+        return response
     
     def get_oauth_url(self, state: str) -> str:
         """Generate GitHub OAuth authorization URL"""
@@ -37,126 +245,307 @@ class GitHubService:
     
     async def exchange_code_for_token(self, code: str) -> Optional[str]:
         """Exchange OAuth code for access token"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.OAUTH_URL}/access_token",
-                    data={
-                        "client_id": self.client_id,
-                        "client_secret": self.client_secret,
-                        "code": code
-                    },
-                    headers={"Accept": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("access_token")
-                return None
-            except Exception as e:
-                print(f"Error exchanging code: {e}")
-                return None
+        try:
+            response = await self.client.post(
+                f"{self.OAUTH_URL}/access_token",
+                data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "code": code
+                },
+                headers={"Accept": "application/json"}
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                return data.get("access_token")
+            return None
+        except Exception as e:
+            print(f"Error exchanging code: {e}")
+            return None
     
     async def get_user_info(self, token: str) -> Optional[Dict]:
         """Get authenticated user information"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.BASE_URL}/user",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Accept": "application/vnd.github.v3+json"
-                    }
-                )
+        try:
+            response = await self._get(token, f"{self.BASE_URL}/user")
+            
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            print(f"Error fetching user info: {e}")
+            return None
+    
+    async def get_repo(self, token: str, owner: str, repo: str) -> Optional[Dict]:
+        """Get a single repository (transport errors propagate to the caller)"""
+        response = await self._get(token, f"{self.BASE_URL}/repos/{owner}/{repo}")
+        
+        if response.status_code == 200:
+            return response.json()
+        return None
+    
+    async def iter_pages(
+        self,
+        token: str,
+        url: str,
+        params: Optional[Dict] = None,
+        max_pages: Optional[int] = None,
+        max_items: Optional[int] = None,
+        prefetch: bool = False,
+        page_state: Optional[Dict] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """Stream a paginated GitHub listing one page at a time.
+        
+        Follows the ``Link: rel="next"`` header until the listing ends or the
+        page/item budget is spent. With ``prefetch`` the next page is requested
+        while the caller is still processing the current one.
+        
+        ``page_state`` is an optional dict shared with the caller: an ``etag``
+        in it is sent as ``If-None-Match`` on the first page and replaced with
+        the fresh ETag; ``not_modified`` is set on a 304 and ``complete`` only
+        when the listing was read to its end without errors.
+        """
+        if max_pages is None:
+            max_pages = self.max_pages
+        if page_state is None:
+            page_state = {}
+        page_state["not_modified"] = False
+        page_state["complete"] = False
+        # Only a first page can be replayed: later page URLs shift as the listing
+        # grows, and a caller tracking its own ETag never reads the cached copy
+        cache_first_page = "etag" not in page_state
+        
+        async def fetch(page_url: str, page_params: Optional[Dict], first: bool = False):
+            headers = {}
+            if first and page_state.get("etag"):
+                headers["If-None-Match"] = page_state["etag"]
+            response = await self._get(token, page_url, page_params, headers, cache=first and cache_first_page)
+            if response.status_code == 304:
+                page_state["not_modified"] = True
+                return [], None
+            if response.status_code != 200:
+                print(f"Error fetching {page_url}: HTTP {response.status_code}")
+                return None, None
+            if first:
+                page_state["etag"] = response.headers.get("ETag")
+            return response.json(), response.links.get("next", {}).get("url")
+        
+        pages = 0
+        items = 0
+        pending = asyncio.ensure_future(fetch(url, params, first=True))
+        try:
+            while pending is not None:
+                page, next_url = await pending
+                pending = None
+                if page is None:
+                    break
+                if not page:
+                    page_state["complete"] = True
+                    break
                 
-                if response.status_code == 200:
-                    return response.json()
-                return None
-            except Exception as e:
-                print(f"Error fetching user info: {e}")
-                return None
-    
-    async def get_user_repos(self, token: str) -> List[Dict]:
-        """Get user's repositories"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.BASE_URL}/user/repos",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Accept": "application/vnd.github.v3+json"
-                    },
-                    params={"per_page": 100, "sort": "updated"}
-                )
+                pages += 1
+                # Only GitHub's missing next link ends the listing; a spent budget does not
+                page_state["complete"] = not next_url
+                if max_items is not None and items + len(page) >= max_items:
+                    if items + len(page) > max_items:
+                        page_state["complete"] = False
+                    page = page[:max_items - items]
+                    next_url = None
+                items += len(page)
+                if max_pages and pages >= max_pages:
+                    next_url = None
                 
-                if response.status_code == 200:
-                    return response.json()
-                return []
-            except Exception as e:
-                print(f"Error fetching repos: {e}")
-                return []
-    
-    async def get_repo_commits(self, token: str, owner: str, repo: str, since: Optional[datetime] = None) -> List[Dict]:
-        """Get commits from a repository"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                params = {"per_page": 100}
-                if since:
-                    params["since"] = since.isoformat()
+                if next_url and prefetch:
+                    pending = asyncio.ensure_future(fetch(next_url, None))
+                yield page
+                if next_url and pending is None:
+                    pending = asyncio.ensure_future(fetch(next_url, None))
+        except Exception as e:
+            print(f"Error paginating {url}: {e}")
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+    
+    def iter_user_repos(self, token: str, **budget) -> AsyncIterator[List[Dict]]:
+        """Stream pages of the user's repositories"""
+        return self.iter_pages(
+            token,
+            f"{self.BASE_URL}/user/repos",
+            {"per_page": 100, "sort": "updated"},
+            **budget
+        )
+    
+    def iter_repo_commits(self, token: str, owner: str, repo: str, since: Optional[datetime] = None, **budget) -> AsyncIterator[List[Dict]]:
+        """Stream pages of a repository's commits"""
+        params = {"per_page": 100}
+        if since:
+            params["since"] = since.isoformat()
+        return self.iter_pages(token, f"{self.BASE_URL}/repos/{owner}/{repo}/commits", params, **budget)
+    
+    async def iter_repo_commits_graphql(
+        self,
+        token: str,
+        owner: str,
+        repo: str,
+        since: Optional[datetime] = None,
+        max_pages: Optional[int] = None,
+        prefetch: bool = False,
+        page_state: Optional[Dict] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """Stream commits with their stats through the GraphQL history connection.
+        
+        Each page holds up to 100 commits that already carry additions,
+        deletions and changed-file counts, so no per-commit detail call is
+        needed. Commits are shaped like REST list items plus ``stats`` and
+        ``files_changed``. ``page_state`` follows iter_pages (there is no ETag).
+        """
+        if max_pages is None:
+            max_pages = self.max_pages
+        if page_state is None:
+            page_state = {}
+        page_state["not_modified"] = False
+        page_state["complete"] = False
+        token_key = self.token_key(token)
+        
+        async def fetch(cursor: Optional[str]):
+            variables = {
+                "owner": owner,
+                "name": repo,
+                "since": since.isoformat() if since else None,
+                "cursor": cursor
+            }
+            response = await self._send(
+                token_key,
+                "POST",
+                self.GRAPHQL_URL,
+                headers=self._headers(token),
+                json={"query": COMMIT_HISTORY_QUERY, "variables": variables}
+            )
+            payload = response.json() if response.status_code == 200 else {}
+            if response.status_code != 200 or payload.get("errors"):
+                print(f"Error fetching commit history for {owner}/{repo}: {payload.get('errors') or response.status_code}")
+                return None, None
+            branch = (payload.get("data", {}).get("repository") or {}).get("defaultBranchRef")
+            if not branch:
+                return [], None
+            history = branch["target"]["history"]
+            page_info = history["pageInfo"]
+            next_cursor = page_info["endCursor"] if page_info["hasNextPage"] else None
+            return [self._graphql_commit(node) for node in history["nodes"]], next_cursor
+        
+        pages = 0
+        pending = asyncio.ensure_future(fetch(None))
+        try:
+            while pending is not None:
+                page, next_cursor = await pending
+                pending = None
+                if page is None:
+                    break
                 
-                response = await client.get(
-                    f"{self.BASE_URL}/repos/{owner}/{repo}/commits",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Accept": "application/vnd.github.v3+json"
-                    },
-                    params=params
-                )
+                pages += 1
+                page_state["complete"] = not next_cursor
+                if max_pages and pages >= max_pages:
+                    next_cursor = None
                 
-                if response.status_code == 200:
-                    return response.json()
-                return []
-            except Exception as e:
-                print(f"Error fetching commits: {e}")
-                return []
-    
-    async def get_repo_pulls(self, token: str, owner: str, repo: str, state: str = "all") -> List[Dict]:
+                if next_cursor and prefetch:
+                    pending = asyncio.ensure_future(fetch(next_cursor))
+                if page:
+                    yield page
+                if next_cursor and pending is None:
+                    pending = asyncio.ensure_future(fetch(next_cursor))
+        except Exception as e:
+            print(f"Error paginating commit history for {owner}/{repo}: {e}")
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+    
+    @staticmethod
+    def _graphql_commit(node: Dict) -> Dict:
+        author = node.get("author") or {}
+        return {
+            "sha": node["oid"],
+            "html_url": node.get("url", ""),
+            "commit": {
+                "author": {
+                    "name": author.get("name") or "Unknown",
+                    "email": author.get("email") or "",
+                    "date": author.get("date")
+                },
+                "committer": {"date": node.get("committedDate")},
+                "message": node.get("message", "")
+            },
+            "stats": {"additions": node.get("additions", 0), "deletions": node.get("deletions", 0)},
+            "files_changed": node.get("changedFilesIfAvailable") or 0
+        }
+    
+    def iter_repo_pulls(
+        self,
+        token: str,
+        owner: str,
+        repo: str,
+        state: str = "all",
+        sort: Optional[str] = None,
+        direction: Optional[str] = None,
+        **budget
+    ) -> AsyncIterator[List[Dict]]:
+        """Stream pages of a repository's pull requests"""
+        params = {"state": state, "per_page": 100}
+        if sort:
+            params["sort"] = sort
+        if direction:
+            params["direction"] = direction
+        return self.iter_pages(token, f"{self.BASE_URL}/repos/{owner}/{repo}/pulls", params, **budget)
+    
+    async def get_user_repos(self, token: str, **budget) -> List[Dict]:
+        """Get user's repositories"""
+        repos = []
+        async for page in self.iter_user_repos(token, **budget):
+            repos.extend(page)
+        return repos
+    
+    async def get_repo_commits(self, token: str, owner: str, repo: str, since: Optional[datetime] = None, **budget) -> List[Dict]:
+        """Get commits from a repository"""
+        commits = []
+        async for page in self.iter_repo_commits(token, owner, repo, since, **budget):
+            commits.extend(page)
+        return commits
+    
+    async def get_repo_pulls(self, token: str, owner: str, repo: str, state: str = "all", **budget) -> List[Dict]:
         """Get pull requests from a repository"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.get(
-                    f"{self.BASE_URL}/repos/{owner}/{repo}/pulls",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Accept": "application/vnd.github.v3+json"
-                    },
-                    params={"state": state, "per_page": 100}
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                return []
-            except Exception as e:
-                print(f"Error fetching PRs: {e}")
-                return []
+        pulls = []
+        async for page in self.iter_repo_pulls(token, owner, repo, state, **budget):
+            pulls.extend(page)
+        return pulls
     
     async def get_commit_details(self, token: str, owner: str, repo: str, sha: str) -> Optional[Dict]:
         """Get detailed commit information"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.get(
-                    f"{self.BASE_URL}/repos/{owner}/{repo}/commits/{sha}",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Accept": "application/vnd.github.v3+json"
-                    }
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                return None
-            except Exception as e:
-                print(f"Error fetching commit details: {e}")
-                return None
+        try:
+            # Commits are immutable and sync never asks for a stored one again, so
+            # caching these (patches included) would only crowd out listings
+            response = await self._get(token, f"{self.BASE_URL}/repos/{owner}/{repo}/commits/{sha}", cache=False)
+            
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            print(f"Error fetching commit details: {e}")
+            return None
+    
+    async def get_commit_details_many(self, token: str, owner: str, repo: str, shas: Iterable[str]) -> List[Optional[Dict]]:
+        """Fetch details for many commits concurrently, bounded per token.
+        
+        Results line up with the order of ``shas``; a failed fetch yields None
+        for that commit without affecting the others.
+        """
+        semaphore = self._token_semaphore(token)
+        
+        async def fetch(sha: str) -> Optional[Dict]:
+            async with semaphore:
+                return await self.get_commit_details(token, owner, repo, sha)
+        
+        results = await asyncio.gather(*(fetch(sha) for sha in shas), return_exceptions=True)
+        return [None if isinstance(r, BaseException) else r for r in results]
 
 github_service = GitHubService()
@@ -0,0 +1,178 @@
+"""AI insight generation with content-addressed caching and single-flight
+
+An insight is keyed by the SHA-256 of the model name and the metrics summary
+it was generated from, so a repeat request over unchanged data is served from
+the ``insights_cache`` collection. Concurrent requests for the same key share
+one generation: the first starts it and everyone follows its chunks.
+
+The model sits behind a small provider interface; ``INSIGHTS_PROVIDER=stub``
+swaps in a local deterministic provider for tests and load runs.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+from pymongo import ASCENDING, IndexModel
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_MESSAGE = "You are an expert engineering analyst who specializes in understanding codebases and development patterns."
+
+INSIGHTS_CACHE_INDEXES = [
+    IndexModel([("key", ASCENDING)], unique=True),
+    # Summaries change with every sync, so old entries are never hit again
+    IndexModel([("generated_at", ASCENDING)], expireAfterSeconds=30 * 86400),
+]
+
+
+class EmergentProvider:
+    """Gemini through emergentintegrations.
+
+    LlmChat only returns complete replies, so the stream is a single chunk.
+    """
+
+    def __init__(self, api_key: Optional[str], vendor: str = "gemini", model: str = "gemini-3-flash-preview"):
+        self.api_key = api_key
+        self.vendor = vendor
+        self.model = model
+
+    async def stream(self, session_id: str, prompt: str) -> AsyncIterator[str]:
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=SYSTEM_MESSAGE
+        ).with_model(self.vendor, self.model)
+        yield await chat.send_message(UserMessage(text=prompt))
+
+
+class StubProvider:
+    """Deterministic local provider that streams a canned reply word by word"""
+
+    model = "stub"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def stream(self, session_id: str, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        text = f"Stub insights {digest}\n\n1. CODEBASE OVERVIEW: generated locally without a model."
+        for word in text.split(" "):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word + " "
+
+
+def provider_from_env():
+    if os.environ.get('INSIGHTS_PROVIDER', 'emergent').lower() == 'stub':
+        return StubProvider(delay=float(os.environ.get('INSIGHTS_STUB_DELAY', '0')))
+    return EmergentProvider(os.environ.get('EMERGENT_LLM_KEY'))
+
+
+@dataclass
+class _Flight:
+    chunks: List[str] = field(default_factory=list)
+    changed: asyncio.Condition = field(default_factory=asyncio.Condition)
+    done: bool = False
+    error: Optional[BaseException] = None
+    generated_at: Optional[datetime] = None
+    task: Optional[asyncio.Task] = None
+
+
+class InsightsService:
+    def __init__(self, collection, provider=None):
+        self.collection = collection
+        self.provider = provider or provider_from_env()
+        self._flights: Dict[str, _Flight] = {}
+
+    def cache_key(self, summary: str) -> str:
+        return hashlib.sha256(f"{self.provider.model}\n{summary}".encode()).hexdigest()
+
+    async def cached(self, key: str) -> Optional[Dict]:
+        try:
+            return await self.collection.find_one({"key": key}, {"_id": 0})
+        except Exception as e:
+            logger.error(f"Error reading insights cache: {e}")
+            return None
+
+    async def stream(self, session_id: str, summary: str, prompt: str) -> AsyncIterator[Dict]:
+        """Yield ``{"text": chunk}`` events, then a final ``{"generated_at", "cached"}`` one"""
+        key = self.cache_key(summary)
+        hit = await self.cached(key)
+        if hit:
+            yield {"text": hit["insights"]}
+            yield {"generated_at": hit["generated_at"], "cached": True}
+            return
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            # Runs detached so a client disconnecting does not cancel it for the others
+            flight.task = asyncio.create_task(self._produce(key, flight, session_id, prompt))
+
+        sent = 0
+        while True:
+            async with flight.changed:
+                await flight.changed.wait_for(lambda: len(flight.chunks) > sent or flight.done)
+                pending = flight.chunks[sent:]
+                finished = flight.done
+            for chunk in pending:
+                yield {"text": chunk}
+            sent += len(pending)
+            if finished and sent == len(flight.chunks):
+                break
+        if flight.error is not None:
+            raise flight.error
+        yield {"generated_at": flight.generated_at, "cached": False}
+
+    async def generate(self, session_id: str, summary: str, prompt: str) -> Dict:
+        text = []
+        final = {}
+        async for event in self.stream(session_id, summary, prompt):
+            if "text" in event:
+                text.append(event["text"])
+            else:
+                final = event
+        return {"insights": "".join(text), **final}
+
+    async def _produce(self, key: str, flight: _Flight, session_id: str, prompt: str):
+        started = time.perf_counter()
+        try:
+            async for chunk in self.provider.stream(session_id, prompt):
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+            metrics.LLM_LATENCY.observe(time.perf_counter() - started, model=self.provider.model, outcome="ok")
+            flight.generated_at = datetime.now(timezone.utc)
+            try:
+                await self.collection.update_one(
+                    {"key": key},
+                    {"$setOnInsert": {
+                        "key": key,
+                        "model": self.provider.model,
+                        "insights": "".join(flight.chunks),
+                        "generated_at": flight.generated_at
+                    }},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.error(f"Error writing insights cache: {e}")
+        except Exception as e:
+            metrics.LLM_LATENCY.observe(time.perf_counter() - started, model=self.provider.model, outcome="error")
+            flight.error = e
+        finally:
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+            self._flights.pop(key, None)
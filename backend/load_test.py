@@ -0,0 +1,283 @@
+"""Load test replaying the dashboard's request pattern
+
+Seeds users with synthetic repositories, commits and pull requests, then
+runs ``--concurrency`` virtual users for ``--duration`` seconds. Each one
+loads the dashboard the way ``DashboardPage.js`` does: ``/repositories``
+and ``/analytics/overview`` together, then the commit, pull request and
+health analytics of one of its repositories together, and starts over.
+
+    python load_test.py --users 50 --concurrency 50 --duration 30
+    python load_test.py --mongomock --users 10 --commits 200
+
+Requests go through the ASGI app in this process, so the run shares one
+event loop the way a single uvicorn worker does, and the event-loop lag it
+reports is the worker's. ``--url`` sends them to a running server instead
+(seeding still goes to ``MONGO_URL``/``DB_NAME``, which must be the
+server's database); the lag is then only the load generator's own.
+
+The database is ``<DB_NAME>_load`` on ``MONGO_URL`` and is dropped afterwards,
+or an in-memory mongomock one with ``--mongomock``. The report is JSON.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'gitinsight')
+os.environ['SYNC_WORKERS'] = '0'
+os.environ['INSIGHTS_PROVIDER'] = 'stub'
+
+import daily_stats  # noqa: E402
+import server  # noqa: E402
+from bench_sync import percentile, use_database  # noqa: E402
+from db_indexes import ensure_indexes  # noqa: E402
+from fake_github import SyntheticRepository  # noqa: E402
+
+
+async def seed(db, users: int, repos_per_user: int, commits: int, prs: int, seed_value: int) -> List[Dict]:
+    """Insert users with their repositories and return a ``{"token"}`` session per user"""
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    sessions = []
+    github_id = 1000
+    for u in range(users):
+        user = server.User(email=f"load-{u}@example.com", name=f"Load {u}", github_username=f"load-{u}")
+        user_dict = user.model_dump()
+        await db.users.insert_one(dict(user_dict))
+        for r in range(repos_per_user):
+            github_id += 1
+            synthetic = SyntheticRepository(github_id, user.github_username, f"repo-{r}", commits, prs, seed_value, now)
+            summary = synthetic.summary()
+            repo = server.Repository(
+                user_id=user.id,
+                github_id=github_id,
+                name=summary["name"],
+                full_name=summary["full_name"],
+                owner=summary["owner"]["login"],
+                description=summary["description"],
+                url=summary["html_url"],
+                is_private=summary["private"],
+                language=summary["language"],
+                last_synced=now
+            )
+            # The rollup is written alongside the raw data below
+            await db.repositories.insert_one({**repo.model_dump(), "daily_stats_ready": True, "data_version": 1})
+
+            # A fresh repository has nothing to dedupe against, so skip the sync upserts
+            documents = [server.commit_document(repo.id, c, synthetic.details[c["sha"]]) for c in synthetic.commits]
+            for start in range(0, len(documents), server.SYNC_WRITE_BATCH_SIZE):
+                await db.commits.insert_many(documents[start:start + server.SYNC_WRITE_BATCH_SIZE])
+            await daily_stats.apply_ops(db, daily_stats.commit_rollup_ops(repo.id, documents))
+            await server.store_pull_requests(repo.id, synthetic.pulls)
+
+        token = server.create_access_token(server.token_claims(user_dict))
+        sessions.append({"token": token})
+    return sessions
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes a task that sleeps ``interval`` seconds"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        # (woken at, lag) pairs on the perf_counter clock
+        self.samples: List[Tuple[float, float]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            woken = time.perf_counter()
+            self.samples.append((woken, max(woken - started - self.interval, 0.0)))
+
+
+class LoadRun:
+    """Virtual users loading dashboards until ``deadline``.
+
+    Every request is recorded with its start and end time; the report only
+    counts the ones that ran entirely inside the measured window.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, sessions: List[Dict], think_time: float):
+        self.client = client
+        self.sessions = sessions
+        self.think_time = think_time
+        # route -> (started, finished, status)
+        self.records: Dict[str, List[Tuple[float, float, str]]] = defaultdict(list)
+
+    async def request(self, route: str, path: str, token: str) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(path, headers={"Authorization": f"Bearer {token}"})
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.records[route].append((started, time.perf_counter(), status))
+        return response
+
+    async def dashboard(self, session: Dict, rng: random.Random):
+        token = session["token"]
+        started = time.perf_counter()
+        repositories, _ = await asyncio.gather(
+            self.request("/api/repositories", "/api/repositories", token),
+            self.request("/api/analytics/overview", "/api/analytics/overview", token)
+        )
+        repo_ids = [r["id"] for r in repositories.json()] if repositories is not None and repositories.status_code == 200 else []
+        if repo_ids:
+            repo_id = rng.choice(repo_ids)
+            await asyncio.gather(
+                self.request("/api/analytics/commits/{repo_id}", f"/api/analytics/commits/{repo_id}", token),
+                self.request("/api/analytics/pull-requests/{repo_id}", f"/api/analytics/pull-requests/{repo_id}", token),
+                self.request("/api/analytics/health/{repo_id}", f"/api/analytics/health/{repo_id}", token)
+            )
+        self.records["dashboard"].append((started, time.perf_counter(), "200" if repo_ids else "incomplete"))
+
+    async def virtual_user(self, index: int, deadline: float):
+        rng = random.Random(index)
+        session = self.sessions[index % len(self.sessions)]
+        while time.perf_counter() < deadline:
+            await self.dashboard(session, rng)
+            if self.think_time:
+                await asyncio.sleep(rng.uniform(0, 2 * self.think_time))
+
+    def window(self, start: float, end: float) -> Dict[str, List[Tuple[float, str]]]:
+        """(latency, status) per route for requests that ran inside [start, end]"""
+        return {
+            route: [(finished - started, status) for started, finished, status in records if started >= start and finished <= end]
+            for route, records in self.records.items()
+        }
+
+
+def _summary(samples: List[float]) -> Optional[Dict]:
+    if not samples:
+        return None
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.5) * 1000, 3),
+        "p90_ms": round(percentile(samples, 0.9) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3)
+    }
+
+
+async def run(args) -> Dict:
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        mongo = AsyncMongoMockClient(tz_aware=True)
+    else:
+        mongo = server.client
+    db_name = os.environ['DB_NAME'] if args.url else f"{os.environ['DB_NAME']}_load"
+    if not args.url:
+        await mongo.drop_database(db_name)
+    db = mongo[db_name]
+    use_database(db)
+    await ensure_indexes(db)
+
+    print(f"Seeding {args.users} users x {args.repos} repositories x {args.commits} commits", file=sys.stderr)
+    started = time.perf_counter()
+    sessions = await seed(db, args.users, args.repos, args.commits, args.prs, args.seed)
+    seed_seconds = time.perf_counter() - started
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url.rstrip('/'), timeout=30.0,
+                                   limits=httpx.Limits(max_connections=args.concurrency * 3))
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://load", timeout=30.0)
+
+    monitor = LoopLagMonitor()
+    load = LoadRun(client, sessions, args.think_time)
+    try:
+        async with client:
+            monitor.start()
+            measured_from = time.perf_counter() + args.warmup
+            deadline = measured_from + args.duration
+            await asyncio.gather(*(load.virtual_user(i, deadline) for i in range(args.concurrency)))
+            await monitor.stop()
+    finally:
+        if not args.url and not args.keep:
+            await mongo.drop_database(db_name)
+
+    window = load.window(measured_from, deadline)
+    dashboards = window.pop("dashboard", [])
+    statuses = defaultdict(int)
+    for samples in window.values():
+        for _, status in samples:
+            statuses[status] += 1
+    requests = sum(statuses.values())
+    lag = [value for woken, value in monitor.samples if measured_from <= woken <= deadline]
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "target": args.url or "in-process",
+        "backend": "mongomock" if args.mongomock else "mongodb",
+        "config": {
+            "users": args.users,
+            "repositories_per_user": args.repos,
+            "commits_per_repository": args.commits,
+            "prs_per_repository": args.prs,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "think_time_seconds": args.think_time
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "requests": requests,
+        "requests_per_second": round(requests / args.duration, 2),
+        "dashboards_per_second": round(len(dashboards) / args.duration, 2),
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "statuses": dict(statuses),
+        "dashboard_latency": _summary([latency for latency, _ in dashboards]),
+        "latency": {route: _summary([latency for latency, _ in samples]) for route, samples in window.items()},
+        "event_loop_lag": _summary(lag)
+    }
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Replay the dashboard request pattern against the API")
+    parser.add_argument("--users", type=int, default=20, help="seeded users, shared round-robin by virtual users")
+    parser.add_argument("--repos", type=int, default=3, help="repositories per user")
+    parser.add_argument("--commits", type=int, default=1000, help="commits per repository")
+    parser.add_argument("--prs", type=int, default=100, help="pull requests per repository")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the run")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between dashboard loads")
+    parser.add_argument("--mongomock", action="store_true", help="use an in-memory database instead of MONGO_URL")
+    parser.add_argument("--url", default=None, help="load a running server instead of the in-process app")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded database")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    if args.url and args.mongomock:
+        parser.error("--mongomock cannot seed a separately running server")
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(run(args))
+    report = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,184 @@
+"""Minimal Prometheus-style metrics
+
+Counters, gauges and histograms with labels, rendered in the Prometheus text
+exposition format by ``render()``. Updates are a dict lookup and a few
+additions under a lock (pymongo reports command events from its own
+threads), so instrumentation can stay on in production.
+
+The server exposes them at ``/metrics`` only to requests bearing
+``METRICS_TOKEN``, since labels include repository ids and token hashes.
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with _lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(v)}" for key, v in values]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = value
+
+    def samples(self) -> List[str]:
+        with _lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(v)}" for key, v in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (last slot is +Inf), sum
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> List[str]:
+        with _lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency until the response starts", ["method", "route"])
+
+MONGO_OPERATIONS = Counter("mongodb_operations_total", "MongoDB commands by collection", ["collection", "command", "outcome"])
+MONGO_LATENCY = Histogram(
+    "mongodb_operation_duration_seconds", "MongoDB command latency by collection", ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+GITHUB_REQUESTS = Counter("github_requests_total", "GitHub API responses by API and status", ["api", "status"])
+GITHUB_LATENCY = Histogram("github_request_duration_seconds", "GitHub API request latency", ["api"])
+GITHUB_RATE_LIMIT_REMAINING = Gauge("github_rate_limit_remaining", "Remaining GitHub API budget per token and rate-limit resource", ["token", "resource"])
+
+SYNC_DURATION = Histogram("sync_duration_seconds", "Repository sync job duration", ["outcome"])
+SYNC_LAST_DURATION = Gauge("sync_last_duration_seconds", "Duration of the last sync per repository", ["repository"])
+ITEMS_WRITTEN = Counter("repository_items_written_total", "Commits and pull requests written by sync and webhooks", ["repository", "kind"])
+SYNC_QUEUE_DEPTH = Gauge("sync_queue_depth", "Queued repository sync jobs")
+
+LLM_LATENCY = Histogram("llm_generation_seconds", "AI insight generation latency", ["model", "outcome"])
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Feeds MongoDB command counts and latency per collection into the metrics"""
+
+    # Commands whose first field is not a collection name
+    _IGNORED = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue", "buildInfo"}
+
+    def __init__(self):
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event):
+        if event.command_name in self._IGNORED:
+            return
+        # getMore names its collection separately from the cursor id
+        key = "collection" if event.command_name == "getMore" else event.command_name
+        collection = event.command.get(key)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, outcome: str):
+        collection = self._collections.pop(event.request_id, None)
+        if collection is None:
+            return
+        MONGO_OPERATIONS.inc(collection=collection, command=event.command_name, outcome=outcome)
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
@@ -0,0 +1,119 @@
+"""One-shot migration of ISO-string timestamps to native BSON datetimes
+
+Usage: ``python migrate_datetimes.py [--dry-run] [--batch-size N]``
+
+Only documents that still hold a string in one of the fields are touched, so
+the migration can be interrupted and re-run at any time; each run resumes
+with whatever is left. Strings that do not parse as ISO-8601 are reported and
+left as they are.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+# Timestamp fields per collection (dotted paths for nested fields)
+DATETIME_FIELDS: Dict[str, List[str]] = {
+    "users": ["created_at"],
+    "repositories": [
+        "created_at",
+        "last_synced",
+        "sync_watermark.last_commit_at",
+        "sync_watermark.last_pr_updated_at"
+    ],
+    "commits": ["timestamp"],
+    "pull_requests": ["created_at", "merged_at", "closed_at"],
+    "health_scores": ["computed_at", "validated_at"],
+}
+
+
+def to_datetime(value: str) -> Optional[datetime]:
+    """Parse an ISO-8601 string; naive values are taken as UTC"""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _get_path(doc: Dict[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+async def migrate_collection(collection, fields: List[str], batch_size: int = 1000, dry_run: bool = False) -> Dict[str, int]:
+    """Convert string timestamps in one collection, batch by batch in _id order"""
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    stats = {"converted": 0, "unparseable": 0}
+    last_id = None
+
+    while True:
+        batch_query = query if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+        docs = await collection.find(batch_query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        operations = []
+        for doc in docs:
+            update = {}
+            for field in fields:
+                value = _get_path(doc, field)
+                if not isinstance(value, str):
+                    continue
+                converted = to_datetime(value)
+                if converted is None:
+                    stats["unparseable"] += 1
+                    print(f"  {collection.name} {doc['_id']}: cannot parse {field}={value!r}")
+                    continue
+                update[field] = converted
+            if update:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+
+        stats["converted"] += len(operations)
+        if operations and not dry_run:
+            await collection.bulk_write(operations, ordered=False)
+        print(f"  {collection.name}: {stats['converted']} documents converted so far")
+
+    return stats
+
+
+async def migrate(db, batch_size: int = 1000, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    results = {}
+    for collection_name, fields in DATETIME_FIELDS.items():
+        print(f"Migrating {collection_name} ({', '.join(fields)})")
+        results[collection_name] = await migrate_collection(db[collection_name], fields, batch_size, dry_run)
+    return results
+
+
+async def _main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Convert ISO-string timestamps to BSON datetimes")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    try:
+        results = await migrate(client[os.environ['DB_NAME']], args.batch_size, args.dry_run)
+    finally:
+        client.close()
+    for collection_name, stats in results.items():
+        print(f"{collection_name}: {stats['converted']} converted, {stats['unparseable']} unparseable")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,101 @@
+"""Keyset pagination helpers for the listing endpoints
+
+Pages are ordered by an indexed sort key plus a unique tie-breaker, and the
+cursor is the opaque, URL-safe encoding of the last row's key. Rows are
+streamed straight from the Motor cursor, so a request holds one document at
+a time whatever the page size.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor of ``size`` values; raises ValueError when it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [_decode_value(v) for v in json.loads(raw)]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def after_key(sort: Sequence[Tuple[str, int]], values: Sequence[Any]) -> Dict[str, Any]:
+    """Filter for rows strictly after ``values`` in ``sort`` order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$lt" if direction < 0 else "$gt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def projection(fields: Optional[str], allowed: Iterable[str], required: Iterable[str]) -> Dict[str, int]:
+    """Mongo projection for a comma-separated ``fields`` parameter.
+
+    Unknown names are ignored; the sort-key fields are always included so
+    the next cursor can be built.
+    """
+    allowed = list(allowed)
+    selected = [f.strip() for f in fields.split(",")] if fields else allowed
+    return {"_id": 0, **{f: 1 for f in selected if f in allowed}, **{f: 1 for f in required}}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def stream_page(
+    cursor,
+    limit: int,
+    key: Callable[[Dict[str, Any]], Sequence[Any]]
+) -> AsyncIterator[bytes]:
+    """Stream ``{"items": [...], "next_cursor": ...}`` from a Motor cursor limited to ``limit``.
+
+    next_cursor is null once a page comes back short.
+    """
+    yield b'{"items":['
+    last = None
+    count = 0
+    async for doc in cursor:
+        if count:
+            yield b","
+        yield json.dumps(doc, default=_json_default).encode()
+        last = doc
+        count += 1
+    next_cursor = encode_cursor(key(last)) if count == limit else None
+    yield f'],"next_cursor":{json.dumps(next_cursor)}}}'.encode()
+
+
+async def stream_array(cursor) -> AsyncIterator[bytes]:
+    """Stream a plain JSON array from a Motor cursor"""
+    yield b"["
+    first = True
+    async for doc in cursor:
+        if not first:
+            yield b","
+        yield json.dumps(doc, default=_json_default).encode()
+        first = False
+    yield b"]"
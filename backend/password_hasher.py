@@ -0,0 +1,83 @@
+"""Password hashing off the event loop
+
+bcrypt is deliberately slow, so hashing and verification run in a small
+dedicated thread pool (the bcrypt C extension releases the GIL). Work beyond
+the pool's capacity waits in a bounded queue; once that is full, callers get
+``HasherOverloaded`` instead of piling up behind a login burst.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Optional
+
+from passlib.context import CryptContext
+
+
+class HasherOverloaded(Exception):
+    """Too many password operations are already running or queued"""
+
+
+class PasswordHasher:
+    def __init__(self, context: CryptContext, max_workers: int = 2, max_queue: int = 16, latency_window: int = 512):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HasherOverloaded()
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self._in_flight -= 1
+            elapsed = time.perf_counter() - started
+            self._latencies.append(elapsed)
+            self.completed += 1
+            self.total_seconds += elapsed
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.context.verify, password, hashed)
+
+    def stats(self) -> Dict:
+        """Counters plus latency percentiles (seconds, queue wait included) over recent operations"""
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)], 4)
+
+        return {
+            "in_flight": self._in_flight,
+            "capacity": self.max_workers + self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "total_seconds": round(self.total_seconds, 4),
+            "p50_seconds": percentile(0.5),
+            "p95_seconds": percentile(0.95),
+            "max_seconds": round(latencies[-1], 4) if latencies else 0.0
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
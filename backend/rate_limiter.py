@@ -0,0 +1,144 @@
+"""Rate-limit-aware scheduling for GitHub API requests"""
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional, Dict, Tuple
+
+import httpx
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Priority of GitHub calls made from the current task; sync code switches it
+# to BACKGROUND so user-facing calls keep the reserved part of the budget
+request_priority: ContextVar[int] = ContextVar("github_request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background_priority():
+    """Run the enclosed GitHub calls as background traffic"""
+    reset_token = request_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(reset_token)
+
+
+class RateLimitExceeded(Exception):
+    """GitHub kept rejecting a request for rate-limit reasons after all retries"""
+
+    def __init__(self, url: str, retry_at: Optional[float] = None):
+        self.url = url
+        self.retry_at = retry_at
+        super().__init__(f"GitHub rate limit exceeded for {url}")
+
+
+@dataclass
+class TokenBudget:
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    reset_at: float = 0.0
+    blocked_until: float = 0.0
+
+
+class RateLimitScheduler:
+    """Tracks the GitHub budget of each token and paces requests against it.
+
+    Budgets come from the ``X-RateLimit-*`` headers of every response and are
+    kept per token and ``X-RateLimit-Resource``, because GitHub meters REST
+    (``core``), GraphQL and search separately.
+    Background requests stop once the remaining budget drops to ``reserve``,
+    leaving that headroom for interactive calls; everyone waits out a
+    ``Retry-After`` or an exhausted budget, and retries back off with jitter.
+    """
+
+    def __init__(
+        self,
+        reserve: int = 100,
+        max_retries: int = 3,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        max_wait: float = 900.0
+    ):
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+        self._budgets: Dict[Tuple[str, str], TokenBudget] = {}
+
+    def budget(self, token_key: str, resource: str = "core") -> TokenBudget:
+        budget = self._budgets.get((token_key, resource))
+        if budget is None:
+            budget = TokenBudget()
+            self._budgets[(token_key, resource)] = budget
+        return budget
+
+    def wait_time(self, token_key: str, priority: int, resource: str = "core") -> float:
+        """Seconds to hold a request of the given priority before sending it"""
+        budget = self.budget(token_key, resource)
+        now = time.time()
+        wait = budget.blocked_until - now
+        if budget.remaining is not None and budget.reset_at > now:
+            floor = self.reserve if priority == BACKGROUND else 0
+            if budget.remaining <= floor:
+                wait = max(wait, budget.reset_at - now)
+        return max(wait, 0.0)
+
+    async def acquire(self, token_key: str, url: str, priority: Optional[int] = None, resource: str = "core"):
+        if priority is None:
+            priority = request_priority.get()
+        wait = self.wait_time(token_key, priority, resource)
+        if wait > self.max_wait:
+            raise RateLimitExceeded(url, time.time() + wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        budget = self.budget(token_key, resource)
+        if budget.remaining is not None:
+            # Count the request up front so concurrent callers see it
+            budget.remaining = max(budget.remaining - 1, 0)
+
+    def record(self, token_key: str, response: httpx.Response, resource: str = "core"):
+        """Update the token budget from a response's rate-limit headers.
+
+        The response's ``X-RateLimit-Resource`` names the budget it reports
+        on; ``resource`` is the fallback when GitHub leaves it out.
+        """
+        headers = response.headers
+        budget = self.budget(token_key, headers.get("x-ratelimit-resource", resource))
+        if "x-ratelimit-remaining" in headers:
+            budget.remaining = int(headers["x-ratelimit-remaining"])
+        if "x-ratelimit-limit" in headers:
+            budget.limit = int(headers["x-ratelimit-limit"])
+        if "x-ratelimit-reset" in headers:
+            budget.reset_at = float(headers["x-ratelimit-reset"])
+
+        if self.is_rate_limited(response):
+            retry_after = headers.get("retry-after")
+            if retry_after is not None:
+                budget.blocked_until = max(budget.blocked_until, time.time() + float(retry_after))
+            elif budget.remaining == 0 and budget.reset_at:
+                budget.blocked_until = max(budget.blocked_until, budget.reset_at)
+
+    @staticmethod
+    def is_rate_limited(response: httpx.Response) -> bool:
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        return (
+            response.headers.get("x-ratelimit-remaining") == "0"
+            or "retry-after" in response.headers
+            or b"rate limit" in response.content.lower()
+        )
+
+    @staticmethod
+    def is_retryable(response: httpx.Response) -> bool:
+        return response.status_code in (502, 503, 504) or RateLimitScheduler.is_rate_limited(response)
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
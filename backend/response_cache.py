@@ -0,0 +1,96 @@
+"""Validator cache for conditional GitHub API requests"""
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+from pymongo import ASCENDING, IndexModel
+
+# Response headers worth replaying with a cached body
+REPLAY_HEADERS = ("etag", "last-modified", "link", "content-type")
+
+RESPONSE_CACHE_INDEXES = [
+    IndexModel([("key", ASCENDING)], unique=True),
+    # A validator a week old rarely still matches, so let the tier shed it
+    IndexModel([("stored_at", ASCENDING)], expireAfterSeconds=7 * 86400),
+]
+
+
+class ResponseCache:
+    """LRU cache of GitHub response bodies and their validators.
+
+    Entries are keyed by (token identity, URL, params). The in-memory tier is
+    always on and bounded by both entry count and total body bytes; a MongoDB
+    collection can be attached as a shared second tier so validators survive
+    restarts and are reused across worker processes.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._collection = None
+
+    def attach_collection(self, collection):
+        """Use a Motor collection as the persistent tier"""
+        self._collection = collection
+
+    @staticmethod
+    def make_key(token_key: str, url: str, params: Optional[Dict] = None) -> str:
+        encoded_params = json.dumps(sorted((params or {}).items()), default=str)
+        return hashlib.sha256(f"{token_key}|{url}|{encoded_params}".encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+
+        if self._collection is not None:
+            try:
+                doc = await self._collection.find_one({"key": key}, {"_id": 0})
+            except Exception as e:
+                print(f"Error reading response cache: {e}")
+                doc = None
+            if doc:
+                entry = {"headers": doc["headers"], "body": doc["body"]}
+                self._remember(key, entry)
+                return entry
+        return None
+
+    async def set(self, key: str, headers: Dict[str, str], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        entry = {
+            "headers": {k: v for k, v in headers.items() if k.lower() in REPLAY_HEADERS},
+            "body": body
+        }
+        self._remember(key, entry)
+
+        if self._collection is not None:
+            try:
+                await self._collection.update_one(
+                    {"key": key},
+                    {"$set": {**entry, "key": key, "stored_at": datetime.now(timezone.utc)}},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"Error writing response cache: {e}")
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous["body"])
+        if len(entry["body"]) > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += len(entry["body"])
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted["body"])
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
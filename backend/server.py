@@ -1,31 +1,68 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
+import json
+import asyncio
 import logging
+import secrets
+import time
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
 from passlib.context import CryptContext
 import httpx
 from github_service import github_service
+import daily_stats
+import analytics_engine
+from ttl_cache import TTLCache
+from password_hasher import PasswordHasher, HasherOverloaded
+import pagination
+import metrics
+from insights import InsightsService
+from webhooks import PAYLOAD_CONTENT_TYPES, WebhookBatcher, parse_payload, verify_signature
+from rate_limiter import RateLimitExceeded, background_priority
+from db_indexes import ensure_indexes, explain_hot_queries
+from sync_queue import SyncQueue, SyncWorkerPool, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BACKGROUND
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Per-collection command metrics; METRICS_MONGO_COMMANDS=false turns the listener off
+mongo_listeners = [metrics.MongoCommandListener()] if os.environ.get('METRICS_MONGO_COMMANDS', 'true').lower() == 'true' else []
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=mongo_listeners)
 db = client[os.environ['DB_NAME']]
 
+# Background sync jobs; SYNC_WORKERS=0 leaves them to separate worker processes
+sync_queue = SyncQueue(
+    db.sync_jobs,
+    lease_seconds=int(os.environ.get('SYNC_JOB_LEASE_SECONDS', '300')),
+    max_attempts=int(os.environ.get('SYNC_JOB_MAX_ATTEMPTS', '5'))
+)
+sync_workers: Optional[SyncWorkerPool] = None
+webhook_reconciler: Optional[asyncio.Task] = None
+rollup_rebuilder: Optional[asyncio.Task] = None
+
+# AI insights, cached by content; INSIGHTS_PROVIDER=stub runs without a model
+insights_service = InsightsService(db.insights_cache)
+
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '2')),
+    max_queue=int(os.environ.get('PASSWORD_HASH_QUEUE', '16'))
+)
 security = HTTPBearer()
 JWT_SECRET = os.environ.get('JWT_SECRET', 'devscope_secure_jwt_secret_key_production_ready')
 JWT_ALGORITHM = "HS256"
@@ -114,12 +151,26 @@ class HealthScore(BaseModel):
     computed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 # Auth helpers
+# Resolved users by id; OAuth updates drop the entry, the TTL covers other processes
+user_cache = TTLCache(
+    max_entries=int(os.environ.get('USER_CACHE_SIZE', '4096')),
+    ttl_seconds=float(os.environ.get('USER_CACHE_TTL_SECONDS', '300'))
+)
+# Put id, email and name in tokens so read-only routes can skip the user lookup
+JWT_USER_CLAIMS = os.environ.get('JWT_USER_CLAIMS', 'false').lower() == 'true'
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=7)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+def token_claims(user: Dict[str, Any]) -> dict:
+    claims = {"user_id": user["id"], "email": user.get("email")}
+    if JWT_USER_CLAIMS:
+        claims["name"] = user.get("name")
+    return claims
+
 def verify_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
@@ -129,103 +180,420 @@ def verify_token(token: str) -> dict:
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = verify_token(token)
+async def load_user(payload: dict) -> User:
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid authentication")
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
     user = await db.users.find_one({"id": user_id}, {"_id": 0})
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return User(**user)
+    user_obj = User(**user)
+    user_cache.set(user_id, user_obj)
+    return user_obj
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await load_user(verify_token(credentials.credentials))
+
+async def get_token_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Identity for read-only routes, taken from the token claims when it has them.
+    
+    The user returned from claims has no GitHub token; routes that call GitHub
+    must depend on get_current_user.
+    """
+    payload = verify_token(credentials.credentials)
+    if JWT_USER_CLAIMS and payload.get("user_id") and payload.get("name") is not None:
+        return User(id=payload["user_id"], email=payload.get("email") or "", name=payload["name"])
+    return await load_user(payload)
+
+SYNC_WRITE_BATCH_SIZE = int(os.environ.get('SYNC_WRITE_BATCH_SIZE', '500'))
+
+async def bulk_upsert(collection, operations: List[UpdateOne]) -> Set[int]:
+    """Write upserts in unordered batches; duplicate-key races are harmless.
+    
+    Returns the positions in ``operations`` that inserted a new document.
+    """
+    inserted = set()
+    for start in range(0, len(operations), SYNC_WRITE_BATCH_SIZE):
+        batch = operations[start:start + SYNC_WRITE_BATCH_SIZE]
+        try:
+            result = await collection.bulk_write(batch, ordered=False)
+            inserted.update(start + index for index in result.upserted_ids)
+        except BulkWriteError as e:
+            # A concurrent sync may have inserted the same key first; anything
+            # other than a duplicate-key error is a real failure
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+            inserted.update(start + upsert["index"] for upsert in e.details.get("upserted", []))
+    return inserted
+
+def _parse_github_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse a GitHub ISO-8601 timestamp (``...Z``) into an aware datetime"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def commit_document(repo_id: str, commit_data: Dict[str, Any], commit_details: Dict[str, Any]) -> Dict[str, Any]:
+    """A commits document from a REST-shaped commit and its details (stats and files)"""
+    return {
+        "id": str(uuid.uuid4()),
+        "repository_id": repo_id,
+        "sha": commit_data.get("sha"),
+        "author": commit_data.get("commit", {}).get("author", {}).get("name", "Unknown"),
+        "author_email": commit_data.get("commit", {}).get("author", {}).get("email", ""),
+        "message": commit_data.get("commit", {}).get("message", ""),
+        "timestamp": _parse_github_time(commit_data.get("commit", {}).get("author", {}).get("date")) or datetime.now(timezone.utc),
+        "files_changed": commit_details.get("files_changed", len(commit_details.get("files", []))),
+        "additions": commit_details.get("stats", {}).get("additions", 0),
+        "deletions": commit_details.get("stats", {}).get("deletions", 0),
+        "url": commit_data.get("html_url", "")
+    }
+
+async def store_commits(repo_id: str, commits: List[Dict[str, Any]]) -> bool:
+    """Insert commits not stored yet and roll them up; True if any was new"""
+    # Commits never change, so only write them the first time
+    commit_ops = [
+        UpdateOne({"repository_id": repo_id, "sha": commit["sha"]}, {"$setOnInsert": commit}, upsert=True)
+        for commit in commits
+    ]
+    inserted = await bulk_upsert(db.commits, commit_ops)
+    metrics.ITEMS_WRITTEN.inc(len(inserted), repository=repo_id, kind="commits")
+    await daily_stats.apply_ops(
+        db, daily_stats.commit_rollup_ops(repo_id, [commits[i] for i in sorted(inserted)])
+    )
+    return bool(inserted)
+
+# Only the single-PR endpoint and webhook payloads carry these
+PR_DETAIL_FIELDS = ("additions", "deletions", "changed_files", "comments")
+
+async def store_pull_requests(repo_id: str, prs_data: List[Dict[str, Any]]) -> bool:
+    """Upsert GitHub pull request objects and roll up the opened/merged ones; True if any was written"""
+    if not prs_data:
+        return False
+    
+    # Previous merge state tells which PRs were merged since they were last stored
+    page_ids = [pr_data.get("id") for pr_data in prs_data]
+    known_prs = {
+        pr["github_id"]: pr for pr in await db.pull_requests.find(
+            {"github_id": {"$in": page_ids}}, {"_id": 0, "github_id": 1, "created_at": 1, "merged_at": 1}
+        ).to_list(len(page_ids))
+    }
+    
+    prs = []
+    pr_ops = []
+    for pr_data in prs_data:
+        pr = {
+            "title": pr_data.get("title", ""),
+            "state": pr_data.get("state", "open"),
+            "merged_at": _parse_github_time(pr_data.get("merged_at")),
+            "closed_at": _parse_github_time(pr_data.get("closed_at")),
+            "url": pr_data.get("html_url", ""),
+            # List items have no size or comment counts; never overwrite ones a webhook stored
+            **{field: pr_data[field] for field in PR_DETAIL_FIELDS if field in pr_data}
+        }
+        created_at = _parse_github_time(pr_data.get("created_at")) or datetime.now(timezone.utc)
+        prs.append({**pr, "github_id": pr_data.get("id"), "created_at": created_at})
+        # Mutable fields are refreshed so state changes (open -> merged) land
+        pr_ops.append(UpdateOne(
+            {"github_id": pr_data.get("id")},
+            {
+                "$set": pr,
+                "$setOnInsert": {
+                    "id": str(uuid.uuid4()),
+                    "repository_id": repo_id,
+                    "github_id": pr_data.get("id"),
+                    "number": pr_data.get("number"),
+                    "author": pr_data.get("user", {}).get("login", "Unknown"),
+                    "created_at": created_at,
+                    **{field: 0 for field in PR_DETAIL_FIELDS if field not in pr_data}
+                }
+            },
+            upsert=True
+        ))
+    
+    inserted = await bulk_upsert(db.pull_requests, pr_ops)
+    metrics.ITEMS_WRITTEN.inc(len(pr_ops), repository=repo_id, kind="pull_requests")
+    opened = [prs[i] for i in sorted(inserted)]
+    merged = []
+    for i, pr in enumerate(prs):
+        previous = None if i in inserted else known_prs.get(pr["github_id"])
+        if pr["merged_at"] and not (previous and previous.get("merged_at")):
+            merged.append({**pr, "created_at": previous["created_at"] if previous else pr["created_at"]})
+    await daily_stats.apply_ops(db, daily_stats.pr_rollup_ops(repo_id, opened, merged))
+    return True
 
 # Background sync task
-async def sync_repository_data(repo_id: str, user_id: str):
-    """Background task to sync repository data from GitHub"""
-    try:
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
-        repo = await db.repositories.find_one({"id": repo_id}, {"_id": 0})
-        
-        if not user or not repo or not user.get("github_token"):
-            return
-        
-        token = user["github_token"]
-        owner = repo["owner"]
-        repo_name = repo["name"]
-        
-        # Fetch commits
-        commits_data = await github_service.get_repo_commits(token, owner, repo_name)
-        
-        for commit_data in commits_data:
-            commit_sha = commit_data.get("sha")
+async def sync_repository_data(repo_id: str, user_id: str) -> Optional[bool]:
+    """Sync repository data from GitHub (run by the sync job workers).
+    
+    Returns False when only part of the data could be fetched so the job is
+    retried; errors are re-raised for the same reason.
+    """
+    with background_priority():
+        try:
+            user = await db.users.find_one({"id": user_id}, {"_id": 0})
+            repo = await db.repositories.find_one({"id": repo_id}, {"_id": 0})
             
-            # Check if commit already exists
-            existing = await db.commits.find_one({"sha": commit_sha})
-            if existing:
-                continue
+            if not user or not repo or not user.get("github_token"):
+                return
             
-            # Get detailed commit info
-            commit_details = await github_service.get_commit_details(token, owner, repo_name, commit_sha)
+            token = user["github_token"]
+            owner = repo["owner"]
+            repo_name = repo["name"]
+            watermark = repo.get("sync_watermark") or {}
             
-            if commit_details:
-                commit = {
-                    "id": str(uuid.uuid4()),
-                    "repository_id": repo_id,
-                    "sha": commit_sha,
-                    "author": commit_data.get("commit", {}).get("author", {}).get("name", "Unknown"),
-                    "author_email": commit_data.get("commit", {}).get("author", {}).get("email", ""),
-                    "message": commit_data.get("commit", {}).get("message", ""),
-                    "timestamp": commit_data.get("commit", {}).get("author", {}).get("date", datetime.now(timezone.utc).isoformat()),
-                    "files_changed": len(commit_details.get("files", [])),
-                    "additions": commit_details.get("stats", {}).get("additions", 0),
-                    "deletions": commit_details.get("stats", {}).get("deletions", 0),
-                    "url": commit_data.get("html_url", "")
+            # Only ask GitHub for commits newer than the last one we stored
+            since = watermark.get("last_commit_at")
+            last_commit_at = since
+            commits_state = {"etag": watermark.get("commits_etag")}
+            commits_missing = False
+            data_changed = False
+            
+            # Fetch commits page by page so memory stays flat on large repositories;
+            # the GraphQL engine returns stats inline and skips the detail calls
+            use_graphql = github_service.commit_fetch_mode == "graphql"
+            iter_commits = github_service.iter_repo_commits_graphql if use_graphql else github_service.iter_repo_commits
+            async for commits_page in iter_commits(
+                token, owner, repo_name, since=since, prefetch=True, page_state=commits_state
+            ):
+                page_shas = [c.get("sha") for c in commits_page]
+                known_shas = {
+                    c["sha"] for c in await db.commits.find(
+                        {"repository_id": repo_id, "sha": {"$in": page_shas}}, {"_id": 0, "sha": 1}
+                    ).to_list(len(page_shas))
                 }
+                new_commits = [c for c in commits_page if c.get("sha") not in known_shas]
                 
-                await db.commits.insert_one(commit)
-        
-        # Fetch pull requests
-        prs_data = await github_service.get_repo_pulls(token, owner, repo_name)
-        
-        for pr_data in prs_data:
-            pr_number = pr_data.get("number")
+                # Get detailed commit info, fanned out with a per-token concurrency cap
+                if use_graphql:
+                    commit_details_list = new_commits
+                else:
+                    commit_details_list = await github_service.get_commit_details_many(
+                        token, owner, repo_name, [c.get("sha") for c in new_commits]
+                    )
+                
+                commits = []
+                for commit_data, commit_details in zip(new_commits, commit_details_list):
+                    if not commit_details:
+                        commits_missing = True
+                        continue
+                    commits.append(commit_document(repo_id, commit_data, commit_details))
+                
+                data_changed = await store_commits(repo_id, commits) or data_changed
+                
+                # GitHub's since filter is on committer date, so track that
+                for commit_data in commits_page:
+                    committed_at = _parse_github_time(commit_data.get("commit", {}).get("committer", {}).get("date"))
+                    if committed_at and (not last_commit_at or committed_at > last_commit_at):
+                        last_commit_at = committed_at
+            
+            # Fetch pull requests, most recently updated first, stopping at the watermark
+            last_pr_updated_at = watermark.get("last_pr_updated_at")
+            newest_pr_updated_at = last_pr_updated_at
+            prs_state = {"etag": watermark.get("pulls_etag")}
+            reached_watermark = False
+            # An incremental sync usually stops inside the first page, so a prefetched
+            # second page would be a wasted rate-limited call; only a full read prefetches
+            async for prs_page in github_service.iter_repo_pulls(
+                token, owner, repo_name, sort="updated", direction="desc",
+                prefetch=last_pr_updated_at is None, page_state=prs_state
+            ):
+                changed_prs = []
+                for pr_data in prs_page:
+                    updated_at = _parse_github_time(pr_data.get("updated_at"))
+                    if last_pr_updated_at and updated_at and updated_at <= last_pr_updated_at:
+                        reached_watermark = True
+                        break
+                    changed_prs.append(pr_data)
+                    if updated_at and (not newest_pr_updated_at or updated_at > newest_pr_updated_at):
+                        newest_pr_updated_at = updated_at
+                
+                data_changed = await store_pull_requests(repo_id, changed_prs) or data_changed
+                
+                if reached_watermark:
+                    break
             
-            # Check if PR already exists
-            existing = await db.pull_requests.find_one({"github_id": pr_data.get("id")})
-            if existing:
-                continue
+            # Update last_synced, and only move the watermark past data we fully read
+            update = {"last_synced": datetime.now(timezone.utc)}
+            if commits_state["complete"] and not commits_missing:
+                update["sync_watermark.last_commit_at"] = last_commit_at
+                update["sync_watermark.commits_etag"] = commits_state.get("etag")
+            if prs_state["complete"] or reached_watermark:
+                update["sync_watermark.last_pr_updated_at"] = newest_pr_updated_at
+                update["sync_watermark.pulls_etag"] = prs_state.get("etag")
+            repo_update = {"$set": update}
+            if data_changed:
+                # Invalidates cached health scores and other derived results
+                repo_update["$inc"] = {"data_version": 1}
+            await db.repositories.update_one({"id": repo_id}, repo_update)
             
-            pr = {
-                "id": str(uuid.uuid4()),
-                "repository_id": repo_id,
-                "github_id": pr_data.get("id"),
-                "number": pr_number,
-                "title": pr_data.get("title", ""),
-                "author": pr_data.get("user", {}).get("login", "Unknown"),
-                "state": pr_data.get("state", "open"),
-                "created_at": pr_data.get("created_at", datetime.now(timezone.utc).isoformat()),
-                "merged_at": pr_data.get("merged_at"),
-                "closed_at": pr_data.get("closed_at"),
-                "additions": pr_data.get("additions", 0),
-                "deletions": pr_data.get("deletions", 0),
-                "changed_files": pr_data.get("changed_files", 0),
-                "comments": pr_data.get("comments", 0),
-                "url": pr_data.get("html_url", "")
-            }
+            # Repositories synced before the rollup existed get it built from raw data once
+            if not repo.get("daily_stats_ready"):
+                try:
+                    await daily_stats.rebuild(db, repo_id)
+                except daily_stats.UnmigratedTimestamps as e:
+                    # Retrying the sync cannot fix this; the startup pass retries after the migration
+                    logger.error(str(e))
+            overview_cache.invalidate(repo["user_id"])
             
-            await db.pull_requests.insert_one(pr)
+            if "sync_watermark.last_commit_at" in update and "sync_watermark.last_pr_updated_at" in update:
+                print(f"Successfully synced repository {repo_name}")
+                return True
+            print(f"Partially synced repository {repo_name}; it will be retried")
+            return False
         
-        # Update last_synced
-        await db.repositories.update_one(
-            {"id": repo_id},
-            {"$set": {"last_synced": datetime.now(timezone.utc).isoformat()}}
+        except Exception as e:
+            print(f"Error syncing repository: {e}")
+            raise
+
+# Webhook ingestion
+GITHUB_WEBHOOK_SECRET = os.environ.get('GITHUB_WEBHOOK_SECRET', '')
+# Webhook-fed repositories are still polled this often to pick up missed deliveries
+WEBHOOK_RECONCILE_INTERVAL = timedelta(seconds=int(os.environ.get('WEBHOOK_RECONCILE_INTERVAL_SECONDS', '21600')))
+
+def push_commit(commit: Dict[str, Any]) -> Dict[str, Any]:
+    """A push payload commit in the REST commit shape"""
+    return {
+        "sha": commit.get("id"),
+        "commit": {
+            "author": {
+                "name": commit.get("author", {}).get("name", "Unknown"),
+                "email": commit.get("author", {}).get("email", ""),
+                "date": commit.get("timestamp")
+            },
+            "message": commit.get("message", "")
+        },
+        "html_url": commit.get("url", "")
+    }
+
+async def ingest_webhook_events(repo_id: str, events: List[Dict[str, Any]]):
+    """Write a batch of push and pull_request deliveries for one repository"""
+    repo = await db.repositories.find_one({"id": repo_id}, {"_id": 0})
+    if not repo:
+        return
+    user = await db.users.find_one({"id": repo["user_id"]}, {"_id": 0, "github_token": 1})
+    
+    # Only default-branch commits, like the polling sync
+    pushed = {}
+    for event in events:
+        payload = event["payload"]
+        if event["event"] != "push":
+            continue
+        default_branch = payload.get("repository", {}).get("default_branch")
+        if payload.get("ref") != f"refs/heads/{default_branch}":
+            continue
+        for commit in payload.get("commits", []):
+            pushed[commit.get("id")] = push_commit(commit)
+    
+    # Latest state of each PR across the batch
+    pull_requests = {}
+    for event in events:
+        pr_data = event["payload"].get("pull_request")
+        if event["event"] != "pull_request" or not pr_data:
+            continue
+        current = pull_requests.get(pr_data.get("id"))
+        if not current or (pr_data.get("updated_at") or "") >= (current.get("updated_at") or ""):
+            pull_requests[pr_data.get("id")] = pr_data
+    
+    data_changed = False
+    if pushed and user and user.get("github_token"):
+        known_shas = {
+            c["sha"] for c in await db.commits.find(
+                {"repository_id": repo_id, "sha": {"$in": list(pushed)}}, {"_id": 0, "sha": 1}
+            ).to_list(len(pushed))
+        }
+        new_commits = [c for sha, c in pushed.items() if sha not in known_shas]
+        # Push payloads carry no line counts; commits whose details fail are left to reconciliation
+        with background_priority():
+            details = await github_service.get_commit_details_many(
+                user["github_token"], repo["owner"], repo["name"], [c["sha"] for c in new_commits]
+            )
+        commits = [commit_document(repo_id, c, d) for c, d in zip(new_commits, details) if d]
+        data_changed = await store_commits(repo_id, commits)
+    if pull_requests:
+        data_changed = await store_pull_requests(repo_id, list(pull_requests.values())) or data_changed
+    
+    now = datetime.now(timezone.utc)
+    repo_update = {"$set": {"last_webhook_at": now}}
+    if data_changed:
+        repo_update["$inc"] = {"data_version": 1}
+    await db.repositories.update_one({"id": repo_id}, repo_update)
+    await db.webhook_deliveries.update_many(
+        {"delivery_id": {"$in": [event["delivery_id"] for event in events]}},
+        {"$set": {"processed_at": now}}
+    )
+    if data_changed:
+        overview_cache.invalidate(repo["user_id"])
+
+webhook_batcher = WebhookBatcher(
+    ingest_webhook_events,
+    max_batch=int(os.environ.get('WEBHOOK_BATCH_SIZE', '100')),
+    flush_interval=float(os.environ.get('WEBHOOK_FLUSH_INTERVAL_SECONDS', '1'))
+)
+
+@api_router.post("/webhooks/github", status_code=202)
+async def github_webhook(request: Request):
+    """Receive push and pull_request events from a GitHub webhook"""
+    if not GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhooks are not configured")
+    
+    body = await request.body()
+    if not verify_signature(GITHUB_WEBHOOK_SECRET, body, request.headers.get("X-Hub-Signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    
+    event = request.headers.get("X-GitHub-Event")
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    if event == "ping":
+        return {"status": "ok"}
+    if event not in ("push", "pull_request"):
+        return {"status": "ignored"}
+    if not delivery_id:
+        raise HTTPException(status_code=400, detail="Missing delivery id")
+    
+    content_type = request.headers.get("Content-Type", "application/json").split(";")[0].strip().lower()
+    if content_type not in PAYLOAD_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail="Webhook content type must be application/json or application/x-www-form-urlencoded"
         )
-        
-        print(f"Successfully synced repository {repo_name}")
-        
-    except Exception as e:
-        print(f"Error syncing repository: {e}")
+    try:
+        payload = parse_payload(body, content_type)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed webhook payload")
+    repo = await db.repositories.find_one(
+        {"github_id": payload.get("repository", {}).get("id")}, {"_id": 0, "id": 1}
+    )
+    if not repo:
+        return {"status": "ignored"}
+    
+    try:
+        await db.webhook_deliveries.insert_one({
+            "delivery_id": delivery_id,
+            "event": event,
+            "repository_id": repo["id"],
+            "received_at": datetime.now(timezone.utc)
+        })
+    except DuplicateKeyError:
+        return {"status": "duplicate"}
+    
+    webhook_batcher.add(repo["id"], {"event": event, "delivery_id": delivery_id, "payload": payload})
+    return {"status": "queued"}
+
+async def reconcile_webhook_repositories():
+    """Queue low-priority polls for webhook-fed repositories not synced within the interval"""
+    while True:
+        cutoff = datetime.now(timezone.utc) - WEBHOOK_RECONCILE_INTERVAL
+        try:
+            async for repo in db.repositories.find(
+                {"last_webhook_at": {"$ne": None}, "$or": [{"last_synced": None}, {"last_synced": {"$lt": cutoff}}]},
+                {"_id": 0, "id": 1, "user_id": 1}
+            ):
+                await sync_queue.enqueue(repo["id"], repo["user_id"], priority=PRIORITY_BACKGROUND)
+        except Exception as e:
+            logger.error(f"Webhook reconciliation failed: {e}")
+        await asyncio.sleep(min(WEBHOOK_RECONCILE_INTERVAL.total_seconds() / 4, 3600))
 
 # GitHub OAuth endpoints
 @api_router.get("/auth/github/login")
@@ -263,7 +631,8 @@ async def github_callback(code: str = Query(...), state: str = Query(...)):
                 "github_username": github_user.get("login")
             }}
         )
-        user_id = existing_user["id"]
+        user_cache.invalidate(existing_user["id"])
+        user = existing_user
     else:
         # Create new user
         user = {
@@ -274,33 +643,50 @@ async def github_callback(code: str = Query(...), state: str = Query(...)):
             "github_token": access_token,
             "github_id": github_user["id"],
             "github_username": github_user.get("login"),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         await db.users.insert_one(user)
-        user_id = user["id"]
     
     # Create JWT token
-    jwt_token = create_access_token({"user_id": user_id, "email": github_user.get("email")})
+    jwt_token = create_access_token(token_claims(user))
     
     # Redirect to frontend with token
     return RedirectResponse(url=f"{os.environ.get('FRONTEND_URL')}/auth/callback?token={jwt_token}")
 
 # Regular auth endpoints
+def password_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-in attempts in progress. Please try again shortly.",
+        headers={"Retry-After": "1"}
+    )
+
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HasherOverloaded:
+        raise password_busy()
+
+async def verify_password(password: str, hashed: str) -> bool:
+    try:
+        return await password_hasher.verify(password, hashed)
+    except HasherOverloaded:
+        raise password_busy()
+
 @api_router.post("/auth/register")
 async def register(user_data: UserCreate):
     existing = await db.users.find_one({"email": user_data.email}, {"_id": 0})
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = pwd_context.hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     user = User(email=user_data.email, name=user_data.name)
     user_dict = user.model_dump()
     user_dict["password"] = hashed_password
-    user_dict["created_at"] = user_dict["created_at"].isoformat()
     
     await db.users.insert_one(user_dict)
     
-    token = create_access_token({"user_id": user.id, "email": user.email})
+    token = create_access_token(token_claims(user_dict))
     return {"token": token, "user": user}
 
 @api_router.post("/auth/login")
@@ -309,11 +695,11 @@ async def login(credentials: UserLogin):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not pwd_context.verify(credentials.password, user.get("password", "")):
+    if not await verify_password(credentials.password, user.get("password", "")):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     user_obj = User(**user)
-    token = create_access_token({"user_id": user_obj.id, "email": user_obj.email})
+    token = create_access_token(token_claims(user))
     return {"token": token, "user": user_obj}
 
 @api_router.get("/auth/me", response_model=User)
@@ -321,23 +707,62 @@ async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 # Repository endpoints
+# Insertion order, with the id breaking ties between repositories imported together
+REPOSITORY_SORT = [("created_at", 1), ("id", 1)]
+
 @api_router.get("/repositories", response_model=List[Repository])
-async def get_repositories(current_user: User = Depends(get_current_user)):
-    repos = await db.repositories.find({"user_id": current_user.id}, {"_id": 0}).to_list(100)
-    for repo in repos:
-        if isinstance(repo.get("created_at"), str):
-            repo["created_at"] = datetime.fromisoformat(repo["created_at"])
-        if repo.get("last_synced") and isinstance(repo["last_synced"], str):
-            repo["last_synced"] = datetime.fromisoformat(repo["last_synced"])
+async def get_repositories(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="The X-Next-Cursor header of the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+    language: Optional[str] = None,
+    current_user: User = Depends(get_token_user)
+):
+    """The user's repositories oldest first, keyset-paginated.
+    
+    The body stays a plain array; a full page carries the cursor of the next
+    one in ``X-Next-Cursor``.
+    """
+    query = {"user_id": current_user.id}
+    if language:
+        query["language"] = language
+    repos = await db.repositories.find(
+        page_query(query, REPOSITORY_SORT, cursor),
+        {"_id": 0, **{field: 1 for field in Repository.model_fields}}
+    ).sort(REPOSITORY_SORT).to_list(limit)
+    if len(repos) == limit:
+        response.headers["X-Next-Cursor"] = pagination.encode_cursor([repos[-1]["created_at"], repos[-1]["id"]])
     return repos
 
 class RepositoryAdd(BaseModel):
     repo_url: str
 
+# Imported repositories past the first IMPORT_SYNC_BURST are synced IMPORT_SYNC_SPACING seconds apart
+IMPORT_SYNC_BURST = int(os.environ.get('IMPORT_SYNC_BURST', '5'))
+IMPORT_SYNC_SPACING = float(os.environ.get('IMPORT_SYNC_SPACING_SECONDS', '10'))
+
+def repository_document(user_id: str, github_repo: Dict[str, Any]) -> Dict[str, Any]:
+    """A repositories document for a GitHub repository object"""
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "github_id": github_repo["id"],
+        "name": github_repo["name"],
+        "full_name": github_repo["full_name"],
+        "owner": github_repo["owner"]["login"],
+        "description": github_repo.get("description"),
+        "url": github_repo["html_url"],
+        "is_private": github_repo["private"],
+        "language": github_repo.get("language"),
+        "stars": github_repo.get("stargazers_count", 0),
+        "forks": github_repo.get("forks_count", 0),
+        "last_synced": None,
+        "created_at": datetime.now(timezone.utc)
+    }
+
 @api_router.post("/repositories/add")
 async def add_repository(
     repo_data: RepositoryAdd,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Add a specific repository by GitHub URL"""
@@ -354,25 +779,17 @@ async def add_repository(
     repo_name = repo_name.replace('.git', '')
     
     # Fetch repo info from GitHub
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(
-                f"https://api.github.com/repos/{owner}/{repo_name}",
-                headers={
-                    "Authorization": f"Bearer {current_user.github_token}",
-                    "Accept": "application/vnd.github.v3+json"
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=404, detail="Repository not found or you don't have access")
-            
-            github_repo = response.json()
-            
-        except httpx.TimeoutException:
-            raise HTTPException(status_code=408, detail="GitHub API timeout")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to fetch repository: {str(e)}")
+    try:
+        github_repo = await github_service.get_repo(current_user.github_token, owner, repo_name)
+    except RateLimitExceeded:
+        raise HTTPException(status_code=429, detail="GitHub API rate limit exceeded. Please try again later.")
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=408, detail="GitHub API timeout")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch repository: {str(e)}")
+    
+    if not github_repo:
+        raise HTTPException(status_code=404, detail="Repository not found or you don't have access")
     
     # Check if already exists
     existing = await db.repositories.find_one({"github_id": github_repo["id"]})
@@ -380,79 +797,63 @@ async def add_repository(
         raise HTTPException(status_code=400, detail="Repository already added")
     
     # Create repository record
-    repo = {
-        "id": str(uuid.uuid4()),
-        "user_id": current_user.id,
-        "github_id": github_repo["id"],
-        "name": github_repo["name"],
-        "full_name": github_repo["full_name"],
-        "owner": github_repo["owner"]["login"],
-        "description": github_repo.get("description"),
-        "url": github_repo["html_url"],
-        "is_private": github_repo["private"],
-        "language": github_repo.get("language"),
-        "stars": github_repo.get("stargazers_count", 0),
-        "forks": github_repo.get("forks_count", 0),
-        "last_synced": None,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
+    repo = repository_document(current_user.id, github_repo)
     
     await db.repositories.insert_one(repo)
+    overview_cache.invalidate(current_user.id)
     
     # Schedule background sync
-    background_tasks.add_task(sync_repository_data, repo["id"], current_user.id)
+    await sync_queue.enqueue(repo["id"], current_user.id, priority=PRIORITY_INTERACTIVE)
     
     return {"message": f"Repository {github_repo['full_name']} added successfully", "repository": Repository(**repo)}
 
 @api_router.post("/repositories/import")
 async def import_repositories(
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Import repositories from GitHub"""
     if not current_user.github_token:
         raise HTTPException(status_code=400, detail="GitHub token not found. Please login with GitHub.")
     
-    # Fetch repos from GitHub
-    github_repos = await github_service.get_user_repos(current_user.github_token)
-    
-    imported_count = 0
-    for github_repo in github_repos:
-        # Check if already imported
-        existing = await db.repositories.find_one({"github_id": github_repo["id"]})
-        if existing:
-            continue
-        
-        repo = {
-            "id": str(uuid.uuid4()),
-            "user_id": current_user.id,
-            "github_id": github_repo["id"],
-            "name": github_repo["name"],
-            "full_name": github_repo["full_name"],
-            "owner": github_repo["owner"]["login"],
-            "description": github_repo.get("description"),
-            "url": github_repo["html_url"],
-            "is_private": github_repo["private"],
-            "language": github_repo.get("language"),
-            "stars": github_repo.get("stargazers_count", 0),
-            "forks": github_repo.get("forks_count", 0),
-            "last_synced": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+    # Each page of repos is checked and inserted in bulk while the next one is fetched
+    imported = []
+    pages_state = {}
+    async for github_repos in github_service.iter_user_repos(current_user.github_token, prefetch=True, page_state=pages_state):
+        page_ids = [github_repo["id"] for github_repo in github_repos]
+        existing_ids = {
+            repo["github_id"] for repo in await db.repositories.find(
+                {"github_id": {"$in": page_ids}}, {"_id": 0, "github_id": 1}
+            ).to_list(len(page_ids))
         }
-        
-        result = await db.repositories.insert_one(repo)
-        imported_count += 1
-        
-        # Schedule background sync for first 5 repos
-        if imported_count <= 5:
-            background_tasks.add_task(sync_repository_data, repo["id"], current_user.id)
+        # Forks and org repos can show up twice in one listing
+        new_repos = {}
+        for github_repo in github_repos:
+            if github_repo["id"] not in existing_ids and github_repo["id"] not in new_repos:
+                new_repos[github_repo["id"]] = repository_document(current_user.id, github_repo)
+        if new_repos:
+            await db.repositories.insert_many(list(new_repos.values()), ordered=False)
+            imported.extend(new_repos.values())
     
-    return {"message": f"Imported {imported_count} repositories", "count": imported_count}
+    if imported:
+        overview_cache.invalidate(current_user.id)
+        # Every imported repository gets synced; all but the first few are
+        # staggered so a large import does not spend the token's budget at once
+        await sync_queue.enqueue_many(
+            [
+                (repo["id"], current_user.id, max(0, i - IMPORT_SYNC_BURST + 1) * IMPORT_SYNC_SPACING)
+                for i, repo in enumerate(imported)
+            ],
+            priority=PRIORITY_NORMAL
+        )
+    
+    message = f"Imported {len(imported)} repositories"
+    if not pages_state.get("complete"):
+        message += "; the repository list could not be read completely, import again to pick up the rest"
+    return {"message": message, "count": len(imported)}
 
 @api_router.post("/repositories/sync/{repo_id}")
 async def sync_repository(
     repo_id: str,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Trigger background sync for a repository"""
@@ -460,209 +861,308 @@ async def sync_repository(
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
     
-    background_tasks.add_task(sync_repository_data, repo_id, current_user.id)
+    job = await sync_queue.enqueue(repo_id, current_user.id, priority=PRIORITY_INTERACTIVE)
     
-    return {"message": "Repository sync initiated", "repository_id": repo_id}
+    return {"message": "Repository sync initiated", "repository_id": repo_id, "job_id": job["id"] if job else None}
 
 @api_router.get("/repositories/{repo_id}", response_model=Repository)
-async def get_repository(repo_id: str, current_user: User = Depends(get_current_user)):
+async def get_repository(repo_id: str, current_user: User = Depends(get_token_user)):
     repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0})
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
-    if isinstance(repo.get("created_at"), str):
-        repo["created_at"] = datetime.fromisoformat(repo["created_at"])
-    if repo.get("last_synced") and isinstance(repo["last_synced"], str):
-        repo["last_synced"] = datetime.fromisoformat(repo["last_synced"])
     return Repository(**repo)
 
-# Analytics endpoints
-@api_router.get("/analytics/overview")
-async def get_analytics_overview(current_user: User = Depends(get_current_user)):
-    repos = await db.repositories.find({"user_id": current_user.id}, {"_id": 0}).to_list(100)
-    repo_ids = [r["id"] for r in repos]
+COMMIT_SORT = [("timestamp", -1), ("sha", -1)]
+PULL_REQUEST_SORT = [("created_at", -1), ("github_id", -1)]
+
+def date_range(since: Optional[datetime], until: Optional[datetime]) -> Dict[str, datetime]:
+    bounds = {}
+    if since:
+        bounds["$gte"] = since
+    if until:
+        bounds["$lt"] = until
+    return bounds
+
+def page_query(query: Dict[str, Any], sort: List, cursor: Optional[str]) -> Dict[str, Any]:
+    if not cursor:
+        return query
+    try:
+        values = pagination.decode_cursor(cursor, len(sort))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"$and": [query, pagination.after_key(sort, values)]}
+
+@api_router.get("/repositories/{repo_id}/commits")
+async def list_commits(
+    repo_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    author: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated commit fields to return"),
+    current_user: User = Depends(get_token_user)
+):
+    """Commits newest first, keyset-paginated with the returned ``next_cursor``"""
+    repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0, "id": 1})
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repository not found")
     
-    total_commits = await db.commits.count_documents({"repository_id": {"$in": repo_ids}})
-    total_prs = await db.pull_requests.count_documents({"repository_id": {"$in": repo_ids}})
+    query = {"repository_id": repo_id}
+    if author:
+        query["author"] = author
+    if since or until:
+        query["timestamp"] = date_range(since, until)
     
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
-    recent_commits = await db.commits.find(
-        {"repository_id": {"$in": repo_ids}, "timestamp": {"$gte": thirty_days_ago.isoformat()}},
-        {"_id": 0, "timestamp": 1}
-    ).to_list(1000)
+    rows = db.commits.find(
+        page_query(query, COMMIT_SORT, cursor),
+        pagination.projection(fields, Commit.model_fields, [field for field, _ in COMMIT_SORT])
+    ).sort(COMMIT_SORT).limit(limit)
+    return StreamingResponse(
+        pagination.stream_page(rows, limit, lambda row: [row["timestamp"], row["sha"]]),
+        media_type="application/json"
+    )
+
+@api_router.get("/repositories/{repo_id}/pull-requests")
+async def list_pull_requests(
+    repo_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    state: Optional[str] = Query(None, pattern="^(open|closed|merged)$"),
+    author: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated pull request fields to return"),
+    current_user: User = Depends(get_token_user)
+):
+    """Pull requests newest first by creation date, keyset-paginated with ``next_cursor``"""
+    repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0, "id": 1})
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repository not found")
     
-    recent_count = len(recent_commits)
+    query = {"repository_id": repo_id}
+    if state == "merged":
+        query["merged_at"] = {"$ne": None}
+    elif state:
+        query["state"] = state
+    if author:
+        query["author"] = author
+    if since or until:
+        query["created_at"] = date_range(since, until)
     
-    return {
-        "total_repositories": len(repos),
-        "total_commits": total_commits,
-        "total_pull_requests": total_prs,
-        "active_repositories": len([r for r in repos if r.get("last_synced")]),
-        "recent_commits": recent_count
+    rows = db.pull_requests.find(
+        page_query(query, PULL_REQUEST_SORT, cursor),
+        pagination.projection(fields, PullRequest.model_fields, [field for field, _ in PULL_REQUEST_SORT])
+    ).sort(PULL_REQUEST_SORT).limit(limit)
+    return StreamingResponse(
+        pagination.stream_page(rows, limit, lambda row: [row["created_at"], row["github_id"]]),
+        media_type="application/json"
+    )
+
+# Analytics endpoints
+# Overview results per user; sync and repository changes in this process drop them early
+overview_cache = TTLCache(
+    max_entries=int(os.environ.get('OVERVIEW_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.environ.get('OVERVIEW_CACHE_TTL_SECONDS', '60'))
+)
+
+def overview_pipeline(user_id: str, since: datetime) -> List[Dict[str, Any]]:
+    """Repository counts plus commit/PR totals summed from the daily rollup"""
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$facet": {
+            "repositories": [
+                {"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "active": {"$sum": {"$cond": [{"$ifNull": ["$last_synced", False]}, 1, 0]}}
+                }}
+            ],
+            "activity": [
+                {"$project": {"_id": 0, "id": 1}},
+                {"$lookup": {
+                    "from": "repo_daily_stats",
+                    "localField": "id",
+                    "foreignField": "repository_id",
+                    "as": "days"
+                }},
+                {"$unwind": "$days"},
+                {"$group": {
+                    "_id": None,
+                    "commits": {"$sum": "$days.commits"},
+                    "pull_requests": {"$sum": "$days.prs_opened"},
+                    "recent_commits": {"$sum": {"$cond": [{"$gte": ["$days.day", since]}, "$days.commits", 0]}}
+                }}
+            ]
+        }}
+    ]
+
+@api_router.get("/analytics/overview")
+async def get_analytics_overview(current_user: User = Depends(get_token_user)):
+    cached = overview_cache.get(current_user.id)
+    if cached is not None:
+        return cached
+    
+    since = daily_stats.day_of(datetime.now(timezone.utc) - timedelta(days=30))
+    result = await db.repositories.aggregate(overview_pipeline(current_user.id, since)).to_list(1)
+    facets = result[0] if result else {}
+    repos = (facets.get("repositories") or [{}])[0]
+    activity = (facets.get("activity") or [{}])[0]
+    
+    overview = {
+        "total_repositories": repos.get("total", 0),
+        "total_commits": activity.get("commits", 0),
+        "total_pull_requests": activity.get("pull_requests", 0),
+        "active_repositories": repos.get("active", 0),
+        "recent_commits": activity.get("recent_commits", 0)
     }
+    overview_cache.set(current_user.id, overview)
+    return overview
 
 @api_router.get("/analytics/commits/{repo_id}")
-async def get_commit_analytics(repo_id: str, current_user: User = Depends(get_current_user)):
+async def get_commit_analytics(repo_id: str, current_user: User = Depends(get_token_user)):
     repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0})
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
     
-    commits = await db.commits.find(
-        {"repository_id": repo_id},
-        {"_id": 0, "timestamp": 1, "additions": 1, "deletions": 1}
-    ).sort("timestamp", -1).to_list(500)
-    
-    daily_commits = {}
-    for commit in commits:
-        ts = commit.get("timestamp")
-        if isinstance(ts, str):
-            ts = datetime.fromisoformat(ts)
-        date_key = ts.strftime("%Y-%m-%d")
-        if date_key not in daily_commits:
-            daily_commits[date_key] = {"count": 0, "additions": 0, "deletions": 0}
-        daily_commits[date_key]["count"] += 1
-        daily_commits[date_key]["additions"] += commit.get("additions", 0)
-        daily_commits[date_key]["deletions"] += commit.get("deletions", 0)
+    # One rollup row per active day instead of every commit
+    rows = await daily_stats.read_rows(db, repo_id)
+    commit_days = [row for row in rows if row.get("commits")]
     
     return {
-        "total_commits": len(commits),
+        "total_commits": sum(row["commits"] for row in commit_days),
         "daily_trend": [{
-            "date": k,
-            "commits": v["count"],
-            "additions": v["additions"],
-            "deletions": v["deletions"]
-        } for k, v in sorted(daily_commits.items())[-30:]]
+            "date": row["day"].strftime("%Y-%m-%d"),
+            "commits": row["commits"],
+            "additions": row.get("additions", 0),
+            "deletions": row.get("deletions", 0)
+        } for row in commit_days[-30:]]
     }
 
+# Packed columns for health and PR distribution, per repository data version; the
+# PR distribution only needs PR columns, so the two are cached separately
+ANALYTICS_COLUMN_CACHE_SIZE = int(os.environ.get('ANALYTICS_COLUMN_CACHE_SIZE', '32'))
+commit_columns_cache = analytics_engine.ColumnCache(ANALYTICS_COLUMN_CACHE_SIZE)
+pr_columns_cache = analytics_engine.ColumnCache(ANALYTICS_COLUMN_CACHE_SIZE)
+
 @api_router.get("/analytics/pull-requests/{repo_id}")
-async def get_pr_analytics(repo_id: str, current_user: User = Depends(get_current_user)):
+async def get_pr_analytics(repo_id: str, current_user: User = Depends(get_token_user)):
     repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0})
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
     
-    prs = await db.pull_requests.find(
-        {"repository_id": repo_id},
-        {"_id": 0}
-    ).to_list(500)
-    
-    merged_prs = [pr for pr in prs if pr.get("state") == "merged" or pr.get("merged_at")]
-    
-    turnaround_times = []
-    for pr in merged_prs:
-        if pr.get("created_at") and pr.get("merged_at"):
-            created = datetime.fromisoformat(pr["created_at"]) if isinstance(pr["created_at"], str) else pr["created_at"]
-            merged = datetime.fromisoformat(pr["merged_at"]) if isinstance(pr["merged_at"], str) else pr["merged_at"]
-            turnaround_times.append((merged - created).total_seconds() / 3600)
-    
-    avg_turnaround = sum(turnaround_times) / len(turnaround_times) if turnaround_times else 0
+    rows = await daily_stats.read_rows(db, repo_id)
+    total_prs = sum(row.get("prs_opened", 0) for row in rows)
+    merged_prs = sum(row.get("prs_merged", 0) for row in rows)
+    turnaround_sum = sum(row.get("turnaround_hours_sum", 0) for row in rows)
+    size_sum = sum(row.get("pr_size_sum", 0) for row in rows)
+    open_prs = await db.pull_requests.count_documents({"repository_id": repo_id, "state": "open"})
+    prs = await load_pr_columns(repo)
     
     return {
-        "total_prs": len(prs),
-        "merged_prs": len(merged_prs),
-        "open_prs": len([pr for pr in prs if pr.get("state") == "open"]),
-        "avg_turnaround_hours": round(avg_turnaround, 2),
-        "avg_size": round(sum(pr.get("additions", 0) + pr.get("deletions", 0) for pr in prs) / len(prs), 2) if prs else 0
+        "total_prs": total_prs,
+        "merged_prs": merged_prs,
+        "open_prs": open_prs,
+        "avg_turnaround_hours": round(turnaround_sum / merged_prs, 2) if merged_prs else 0,
+        "avg_size": round(size_sum / total_prs, 2) if total_prs else 0,
+        **analytics_engine.pr_distribution(prs)
     }
 
+HEALTH_SCORE_FIELDS = ("overall_score", "commit_frequency_score", "pr_velocity_score", "code_quality_score", "collaboration_score")
+# Scores depend on "the last 30 days" too, so even unchanged data is re-scored after this long
+HEALTH_CACHE_TTL = timedelta(seconds=int(os.environ.get('HEALTH_CACHE_TTL_SECONDS', '3600')))
+
 @api_router.get("/analytics/health/{repo_id}")
-async def get_repository_health(repo_id: str, current_user: User = Depends(get_current_user)):
+async def get_repository_health(repo_id: str, current_user: User = Depends(get_token_user)):
     repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0})
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
     
-    commits = await db.commits.find(
-        {"repository_id": repo_id},
-        {"_id": 0, "timestamp": 1, "author": 1, "additions": 1, "deletions": 1}
-    ).to_list(1000)
-    prs = await db.pull_requests.find(
-        {"repository_id": repo_id},
-        {"_id": 0, "state": 1, "merged_at": 1, "created_at": 1, "closed_at": 1, "additions": 1, "deletions": 1, "comments": 1, "changed_files": 1}
-    ).to_list(500)
-    
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
-    recent_commits = [c for c in commits if datetime.fromisoformat(c["timestamp"]) > thirty_days_ago] if commits else []
-    commit_frequency_score = min(len(recent_commits) / 30 * 10, 100)
+    # Serve the stored score while the repository's data version is unchanged
+    data_version = repo.get("data_version", 0)
+    now = datetime.now(timezone.utc)
+    latest = await db.health_scores.find_one({"repository_id": repo_id}, sort=[("computed_at", -1)])
+    if (
+        latest
+        and latest.get("data_version") == data_version
+        and latest.get("validated_at", latest["computed_at"]) > now - HEALTH_CACHE_TTL
+    ):
+        return HealthScore(**latest)
     
-    merged_prs = [pr for pr in prs if pr.get("state") == "merged" or pr.get("merged_at")]
-    pr_velocity_score = min(len(merged_prs) / max(len(prs), 1) * 100, 100) if prs else 50
+    health = await compute_repository_health(repo)
     
-    # Code quality score based on multiple factors
-    if prs:
-        # Factor 1: PR size (smaller PRs are better)
-        avg_pr_size = sum(pr.get("additions", 0) + pr.get("deletions", 0) for pr in prs) / len(prs)
-        size_score = max(100 - (avg_pr_size / 10), 20)  # Penalize large PRs more heavily
-        
-        # Factor 2: PR review engagement (comments indicate thorough review)
-        avg_comments = sum(pr.get("comments", 0) for pr in prs) / len(prs)
-        review_score = min(avg_comments * 15, 100)  # More comments = better reviews
-        
-        # Factor 3: Files changed per PR (fewer files = more focused changes)
-        avg_files_changed = sum(pr.get("changed_files", 0) for pr in prs) / len(prs)
-        focus_score = max(100 - (avg_files_changed * 5), 30)
-        
-        # Weighted average
-        code_quality_score = (size_score * 0.5 + review_score * 0.3 + focus_score * 0.2)
-    else:
-        # No PRs - use commit patterns
-        if commits:
-            # Analyze commit sizes
-            avg_commit_size = sum(c.get("additions", 0) + c.get("deletions", 0) for c in commits) / len(commits)
-            # Smaller, frequent commits are better
-            code_quality_score = max(100 - (avg_commit_size / 20), 40)
-        else:
-            code_quality_score = 50  # Neutral score for no data
-    
-    unique_authors = set(c.get("author") for c in commits if c.get("author"))
-    collaboration_score = min(len(unique_authors) * 20, 100)
-    
-    overall_score = (commit_frequency_score + pr_velocity_score + code_quality_score + collaboration_score) / 4
-    
-    health = HealthScore(
-        repository_id=repo_id,
-        overall_score=round(overall_score, 2),
-        commit_frequency_score=round(commit_frequency_score, 2),
-        pr_velocity_score=round(pr_velocity_score, 2),
-        code_quality_score=round(code_quality_score, 2),
-        collaboration_score=round(collaboration_score, 2)
-    )
+    # Only persist a new document when a score actually moved
+    if latest and all(latest.get(field) == getattr(health, field) for field in HEALTH_SCORE_FIELDS):
+        await db.health_scores.update_one(
+            {"_id": latest["_id"]},
+            {"$set": {"data_version": data_version, "validated_at": now}}
+        )
+        return HealthScore(**latest)
     
     health_dict = health.model_dump()
-    health_dict["computed_at"] = health_dict["computed_at"].isoformat()
+    health_dict.update({"data_version": data_version, "validated_at": now})
     await db.health_scores.insert_one(health_dict)
     
     return health
 
-@api_router.post("/insights/generate/{repo_id}")
-async def generate_insights(repo_id: str, current_user: User = Depends(get_current_user)):
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
-    
-    repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0})
-    if not repo:
-        raise HTTPException(status_code=404, detail="Repository not found")
-    
+async def load_commit_columns(repo: Dict[str, Any]) -> analytics_engine.CommitColumns:
+    """Commit columns for the repository's current data version"""
+    data_version = repo.get("data_version", 0)
+    columns = commit_columns_cache.get(repo["id"], data_version)
+    if columns is None:
+        commits = await db.commits.find(
+            {"repository_id": repo["id"]},
+            {"_id": 0, "timestamp": 1, "author": 1, "additions": 1, "deletions": 1}
+        ).to_list(None)
+        columns = analytics_engine.commit_columns(commits)
+        commit_columns_cache.set(repo["id"], data_version, columns)
+    return columns
+
+async def load_pr_columns(repo: Dict[str, Any]) -> analytics_engine.PullRequestColumns:
+    """Pull request columns for the repository's current data version"""
+    data_version = repo.get("data_version", 0)
+    columns = pr_columns_cache.get(repo["id"], data_version)
+    if columns is None:
+        prs = await db.pull_requests.find(
+            {"repository_id": repo["id"]},
+            {"_id": 0, "state": 1, "merged_at": 1, "created_at": 1, "additions": 1, "deletions": 1, "comments": 1, "changed_files": 1}
+        ).to_list(None)
+        columns = analytics_engine.pr_columns(prs)
+        pr_columns_cache.set(repo["id"], data_version, columns)
+    return columns
+
+async def compute_repository_health(repo: Dict[str, Any]) -> HealthScore:
+    commits, prs = await asyncio.gather(load_commit_columns(repo), load_pr_columns(repo))
+    scores = analytics_engine.health_components(commits, prs)
+    return HealthScore(
+        repository_id=repo["id"],
+        **{name: round(value, 2) for name, value in scores.items()}
+    )
+
+async def build_insights_prompt(repo: Dict[str, Any]) -> Dict[str, str]:
+    """The metrics summary for a repository and the prompt built around it"""
+    repo_id = repo["id"]
     commits = await db.commits.find(
         {"repository_id": repo_id},
-        {"_id": 0, "timestamp": 1, "author": 1, "additions": 1, "deletions": 1}
-    ).to_list(1000)
-    prs = await db.pull_requests.find(
-        {"repository_id": repo_id},
-        {"_id": 0, "state": 1, "merged_at": 1, "created_at": 1, "closed_at": 1, "additions": 1, "deletions": 1, "comments": 1, "changed_files": 1}
-    ).to_list(500)
+        {"_id": 0, "author": 1, "message": 1}
+    ).sort([("timestamp", -1), ("sha", -1)]).to_list(100)
+    total_commits = await db.commits.count_documents({"repository_id": repo_id})
+    total_prs = await db.pull_requests.count_documents({"repository_id": repo_id})
     health = await db.health_scores.find_one({"repository_id": repo_id}, {"_id": 0}, sort=[("computed_at", -1)])
     
-    # Get file types and commit patterns
-    file_changes = {}
+    # Get commit patterns
     commit_messages = []
     authors = set()
     
-    for commit in commits[:100]:
+    for commit in commits:
         authors.add(commit.get("author", "Unknown"))
         commit_messages.append(commit.get("message", ""))
     
     metrics_summary = f"""Repository: {repo['full_name']}
 Language: {repo.get('language', 'Unknown')}
 Description: {repo.get('description', 'No description')}
-Total Commits: {len(commits)}
-Total Pull Requests: {len(prs)}
+Total Commits: {total_commits}
+Total Pull Requests: {total_prs}
 Contributors: {len(authors)}
 Health Score: {health.get('overall_score', 'N/A') if health else 'Not computed'}
 Commit Frequency Score: {health.get('commit_frequency_score', 'N/A') if health else 'N/A'}
@@ -674,15 +1174,7 @@ Recent commit messages (sample):
 {chr(10).join(commit_messages[:10])}
 """
     
-    try:
-        chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY'),
-            session_id=f"insights_{repo_id}_{datetime.now(timezone.utc).timestamp()}",
-            system_message="You are an expert engineering analyst who specializes in understanding codebases and development patterns."
-        ).with_model("gemini", "gemini-3-flash-preview")
-        
-        message = UserMessage(
-            text=f"""Analyze this GitHub repository and provide a comprehensive, detailed analysis:
+    prompt = f"""Analyze this GitHub repository and provide a comprehensive, detailed analysis:
 
 {metrics_summary}
 
@@ -699,27 +1191,130 @@ Please provide:
 5. ACTIONABLE RECOMMENDATIONS: Provide 3-5 specific, data-driven recommendations to improve velocity, quality, or collaboration.
 
 Be detailed and insightful. Focus on understanding what the codebase does and how the team is working."""
-        )
-        
-        response = await chat.send_message(message)
+    
+    return {
+        "session_id": f"insights_{repo_id}_{datetime.now(timezone.utc).timestamp()}",
+        "summary": metrics_summary,
+        "prompt": prompt
+    }
+
+@api_router.post("/insights/generate/{repo_id}")
+async def generate_insights(repo_id: str, current_user: User = Depends(get_current_user)):
+    repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0})
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    
+    request = await build_insights_prompt(repo)
+    
+    try:
+        result = await insights_service.generate(**request)
         
         return {
             "repository_id": repo_id,
-            "insights": response,
-            "generated_at": datetime.now(timezone.utc).isoformat()
+            "insights": result["insights"],
+            "generated_at": result["generated_at"].isoformat(),
+            "cached": result["cached"]
         }
     except Exception as e:
         logging.error(f"Error generating insights: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate insights: {str(e)}")
 
+def sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+@api_router.post("/insights/generate/{repo_id}/stream")
+async def stream_insights(repo_id: str, current_user: User = Depends(get_current_user)):
+    """Server-sent events: ``chunk`` events with text, then ``done`` (or ``error``)"""
+    repo = await db.repositories.find_one({"id": repo_id, "user_id": current_user.id}, {"_id": 0})
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    
+    request = await build_insights_prompt(repo)
+    
+    async def events():
+        try:
+            async for event in insights_service.stream(**request):
+                if "text" in event:
+                    yield sse_event("chunk", {"text": event["text"]})
+                else:
+                    yield sse_event("done", {
+                        "repository_id": repo_id,
+                        "generated_at": event["generated_at"].isoformat(),
+                        "cached": event["cached"]
+                    })
+        except Exception as e:
+            logging.error(f"Error generating insights: {str(e)}")
+            yield sse_event("error", {"detail": f"Failed to generate insights: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Diagnostics expose every query shape and the worker pool load, so they take an
+# operator token rather than a user session; unset disables them
+DIAGNOSTICS_TOKEN = os.environ.get('DIAGNOSTICS_TOKEN', '')
+
+# /metrics labels series with repository ids and token hashes; Prometheus sends
+# this as its bearer token (``authorization`` in the scrape config), unset disables it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+def check_operator_token(expected: str, presented: str, name: str):
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(presented.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail=f"{name} require the operator token")
+
+async def require_diagnostics_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    check_operator_token(DIAGNOSTICS_TOKEN, credentials.credentials, "Diagnostics")
+
+async def require_metrics_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    check_operator_token(METRICS_TOKEN, credentials.credentials, "Metrics")
+
+@api_router.get("/diagnostics/indexes", dependencies=[Depends(require_diagnostics_token)])
+async def get_index_diagnostics():
+    """Explain every hot query and flag the ones that scan a whole collection"""
+    report = await explain_hot_queries(db)
+    return {
+        "queries": report,
+        "collection_scans": [r["query"] for r in report if r.get("collection_scan")]
+    }
+
+@api_router.get("/diagnostics/password-hashing", dependencies=[Depends(require_diagnostics_token)])
+async def get_password_hashing_diagnostics():
+    """Password hash pool load and latency"""
+    return password_hasher.stats()
+
 app.include_router(api_router)
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template so ids in the path do not explode the series
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    metrics.HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, route=path)
+    metrics.HTTP_REQUESTS.inc(method=request.method, route=path, status=response.status_code)
+    return response
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    """Prometheus text exposition of the process's metrics"""
+    try:
+        metrics.SYNC_QUEUE_DEPTH.set(await sync_queue.depth())
+    except Exception as e:
+        logger.error(f"Error reading sync queue depth: {e}")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 logging.basicConfig(
@@ -728,6 +1323,55 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def startup_http_client():
+    if os.environ.get('GITHUB_CACHE_MONGO', 'false').lower() == 'true':
+        github_service.cache.attach_collection(db.github_response_cache)
+    await github_service.startup()
+
+@app.on_event("startup")
+async def startup_sync_workers():
+    global sync_workers
+    concurrency = int(os.environ.get('SYNC_WORKERS', '2'))
+    if concurrency > 0:
+        sync_workers = SyncWorkerPool(sync_queue, sync_repository_data, concurrency=concurrency)
+        sync_workers.start()
+
+async def rebuild_pending_rollups():
+    """Build the daily rollup of repositories that have none, so analytics do not read zeros until a sync"""
+    try:
+        await daily_stats.rebuild_pending(db)
+    except daily_stats.UnmigratedTimestamps as e:
+        logger.error(f"{e}; analytics of repositories without a rollup stay empty until then")
+    except Exception as e:
+        logger.error(f"Error rebuilding daily stats: {e}")
+    overview_cache.clear()
+
+@app.on_event("startup")
+async def startup_daily_stats():
+    global rollup_rebuilder
+    rollup_rebuilder = asyncio.create_task(rebuild_pending_rollups())
+
+@app.on_event("startup")
+async def startup_webhooks():
+    global webhook_reconciler
+    webhook_batcher.start()
+    if GITHUB_WEBHOOK_SECRET and WEBHOOK_RECONCILE_INTERVAL.total_seconds() > 0:
+        webhook_reconciler = asyncio.create_task(reconcile_webhook_repositories())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if rollup_rebuilder is not None:
+        rollup_rebuilder.cancel()
+    if webhook_reconciler is not None:
+        webhook_reconciler.cancel()
+    await webhook_batcher.stop()
+    if sync_workers is not None:
+        await sync_workers.stop()
+    await github_service.close()
+    password_hasher.shutdown()
     client.close()
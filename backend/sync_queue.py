@@ -0,0 +1,296 @@
+"""Durable repository sync job queue backed by MongoDB
+
+Jobs live in the ``sync_jobs`` collection. Workers claim them with a lease,
+so a job held by a crashed worker is picked up again once its lease expires.
+At most one queued job exists per repository, and a duplicate request only
+raises that job's priority. A queued job is not started while the same
+repository is still being synced.
+
+The worker pool runs inside the API process (``SYNC_WORKERS`` > 0), or on its
+own with ``python sync_queue.py`` so sync throughput can scale across processes.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Higher runs first
+PRIORITY_INTERACTIVE = 10
+PRIORITY_NORMAL = 5
+PRIORITY_BACKGROUND = 0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SYNC_JOB_INDEXES = [
+    # One queued job per repository makes duplicate requests coalesce
+    IndexModel(
+        [("repository_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"status": QUEUED}
+    ),
+    # One running job per repository backs claim() against racing workers
+    IndexModel(
+        [("repository_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"status": RUNNING},
+        name="repository_id_running_unique"
+    ),
+    IndexModel([("status", ASCENDING), ("priority", DESCENDING), ("run_after", ASCENDING)]),
+    IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+    # Settled jobs are only kept for inspection; queued and running ones have no finished_at
+    IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=7 * 86400),
+]
+
+SyncHandler = Callable[[str, str], Awaitable[Optional[bool]]]
+
+
+class SyncQueue:
+    """Enqueue, claim and settle sync jobs"""
+
+    def __init__(
+        self,
+        collection,
+        lease_seconds: int = 300,
+        max_attempts: int = 5,
+        retry_base_seconds: int = 30
+    ):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+
+    def _enqueue_update(self, repository_id: str, user_id: str, priority: int, now: datetime, run_after: datetime) -> Dict:
+        return {
+            "$setOnInsert": {
+                "id": str(uuid.uuid4()),
+                "repository_id": repository_id,
+                "status": QUEUED,
+                "attempts": 0,
+                "created_at": now
+            },
+            "$set": {"user_id": user_id, "updated_at": now},
+            "$max": {"priority": priority},
+            "$min": {"run_after": run_after}
+        }
+
+    async def enqueue(self, repository_id: str, user_id: str, priority: int = PRIORITY_NORMAL, delay: float = 0) -> Dict:
+        """Queue a sync, or fold it into the repository's pending job"""
+        now = datetime.now(timezone.utc)
+        run_after = now + timedelta(seconds=delay)
+        try:
+            return await self.collection.find_one_and_update(
+                {"repository_id": repository_id, "status": QUEUED},
+                self._enqueue_update(repository_id, user_id, priority, now, run_after),
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost the upsert race to a concurrent request for the same repository
+            return await self.collection.find_one(
+                {"repository_id": repository_id, "status": QUEUED}, {"_id": 0}
+            )
+
+    async def enqueue_many(self, jobs: List[Tuple[str, str, float]], priority: int = PRIORITY_NORMAL) -> int:
+        """Queue ``(repository_id, user_id, delay)`` syncs in one bulk write; returns how many were new"""
+        if not jobs:
+            return 0
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne(
+                {"repository_id": repository_id, "status": QUEUED},
+                self._enqueue_update(repository_id, user_id, priority, now, now + timedelta(seconds=delay)),
+                upsert=True
+            )
+            for repository_id, user_id, delay in jobs
+        ]
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            return result.upserted_count
+        except BulkWriteError as e:
+            # Duplicate keys are concurrent enqueues of the same repository, which already coalesced
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+            return e.details.get("nUpserted", 0)
+
+    async def claim(self, worker_id: str) -> Optional[Dict]:
+        """Lease the most urgent runnable job, including ones whose lease lapsed.
+
+        A queued job waits while its repository has a running one, so two
+        syncs of the same repository never overlap.
+        """
+        now = datetime.now(timezone.utc)
+        busy = await self.collection.distinct("repository_id", {"status": RUNNING})
+        try:
+            return await self.collection.find_one_and_update(
+                {"$or": [
+                    {"status": QUEUED, "run_after": {"$lte": now}, "repository_id": {"$nin": busy}},
+                    {"status": RUNNING, "lease_expires_at": {"$lt": now}}
+                ]},
+                {
+                    "$set": {
+                        "status": RUNNING,
+                        "lease_owner": worker_id,
+                        "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                        "started_at": now,
+                        "updated_at": now
+                    },
+                    "$inc": {"attempts": 1}
+                },
+                projection={"_id": 0},
+                sort=[("priority", DESCENDING), ("run_after", ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another worker started this repository's running job in the meantime
+            return None
+
+    async def renew(self, job: Dict, worker_id: str) -> bool:
+        result = await self.collection.update_one(
+            {"id": job["id"], "lease_owner": worker_id, "status": RUNNING},
+            {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.modified_count == 1
+
+    async def complete(self, job: Dict, worker_id: str):
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"id": job["id"], "lease_owner": worker_id},
+            {"$set": {"status": DONE, "finished_at": now, "updated_at": now}, "$unset": {"lease_expires_at": ""}}
+        )
+
+    async def fail(self, job: Dict, worker_id: str, error: str):
+        """Retry with exponential backoff until max_attempts, then give up"""
+        now = datetime.now(timezone.utc)
+        if job.get("attempts", 1) >= self.max_attempts:
+            update = {"status": FAILED, "finished_at": now}
+        else:
+            delay = self.retry_base_seconds * 2 ** (job.get("attempts", 1) - 1)
+            update = {"status": QUEUED, "run_after": now + timedelta(seconds=delay)}
+        update.update({"last_error": error, "updated_at": now})
+        try:
+            await self.collection.update_one(
+                {"id": job["id"], "lease_owner": worker_id},
+                {"$set": update, "$unset": {"lease_expires_at": ""}}
+            )
+        except DuplicateKeyError:
+            # A newer request is already queued for this repository and will cover the retry
+            await self.collection.update_one(
+                {"id": job["id"], "lease_owner": worker_id},
+                {"$set": {"status": DONE, "last_error": error, "finished_at": now, "updated_at": now},
+                 "$unset": {"lease_expires_at": ""}}
+            )
+
+    async def depth(self) -> int:
+        return await self.collection.count_documents({"status": QUEUED})
+
+
+class SyncWorkerPool:
+    """A fixed number of async workers draining a SyncQueue"""
+
+    def __init__(self, queue: SyncQueue, handler: SyncHandler, concurrency: int = 2, poll_interval: float = 2.0):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    def start(self):
+        self._stopping.clear()
+        for n in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._work(f"{self.worker_prefix}:{n}")))
+
+    async def stop(self):
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self):
+        self.start()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _work(self, worker_id: str):
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(worker_id)
+            except Exception as e:
+                logger.error(f"Sync worker {worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job, worker_id)
+
+    async def _run(self, job: Dict, worker_id: str):
+        heartbeat = asyncio.create_task(self._heartbeat(job, worker_id))
+        started = time.perf_counter()
+        outcome = "cancelled"
+        try:
+            synced = await self.handler(job["repository_id"], job["user_id"])
+            if synced is False:
+                outcome = "partial"
+                await self.queue.fail(job, worker_id, "partial sync")
+            else:
+                outcome = "complete"
+                await self.queue.complete(job, worker_id)
+        except asyncio.CancelledError:
+            # Leave the job leased; another worker takes it once the lease expires
+            raise
+        except Exception as e:
+            outcome = "error"
+            logger.error(f"Sync job {job['id']} for repository {job['repository_id']} failed: {e}")
+            await self.queue.fail(job, worker_id, str(e))
+        finally:
+            heartbeat.cancel()
+            elapsed = time.perf_counter() - started
+            metrics.SYNC_DURATION.observe(elapsed, outcome=outcome)
+            metrics.SYNC_LAST_DURATION.set(round(elapsed, 3), repository=job["repository_id"])
+
+    async def _heartbeat(self, job: Dict, worker_id: str):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await self.queue.renew(job, worker_id):
+                return
+
+
+async def _main():
+    import server
+    from db_indexes import ensure_indexes
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    await ensure_indexes(server.db)
+    await server.github_service.startup()
+    pool = SyncWorkerPool(
+        server.sync_queue,
+        server.sync_repository_data,
+        concurrency=int(os.environ.get('SYNC_WORKER_CONCURRENCY', '4'))
+    )
+    try:
+        await pool.run_forever()
+    finally:
+        await server.github_service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -14,6 +14,21 @@ import { toast } from 'sonner';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// The repository list is paginated; follow X-Next-Cursor until the last page
+const fetchAllRepositories = async (token) => {
+  const repositories = [];
+  let cursor = null;
+  do {
+    const response = await axios.get(`${API}/repositories`, {
+      headers: { Authorization: `Bearer ${token}` },
+      params: cursor ? { cursor } : {}
+    });
+    repositories.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return repositories;
+};
+
 export default function DashboardPage() {
   const [loading, setLoading] = useState(true);
   const [importing, setImporting] = useState(false);
@@ -42,14 +57,14 @@ export default function DashboardPage() {
   const fetchData = async () => {
     try {
       const token = localStorage.getItem('devscope_token');
-      const [reposRes, overviewRes] = await Promise.all([
-        axios.get(`${API}/repositories`, { headers: { Authorization: `Bearer ${token}` } }),
+      const [repos, overviewRes] = await Promise.all([
+        fetchAllRepositories(token),
         axios.get(`${API}/analytics/overview`, { headers: { Authorization: `Bearer ${token}` } })
       ]);
-      setRepositories(reposRes.data);
+      setRepositories(repos);
       setOverview(overviewRes.data);
-      if (reposRes.data.length > 0) {
-        setSelectedRepo(reposRes.data[0]);
+      if (repos.length > 0) {
+        setSelectedRepo(repos[0]);
       }
     } catch (error) {
       toast.error('Failed to load dashboard data');
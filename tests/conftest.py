@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules import each other by bare name, the way uvicorn runs them
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server.py reads these at import; tests never start workers or call a model
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'gitinsight_test')
+os.environ['SYNC_WORKERS'] = '0'
+os.environ['INSIGHTS_PROVIDER'] = 'stub'
+
+
+@pytest.fixture
+def server_db(monkeypatch):
+    """Point the server module and its services at a fresh in-memory database"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+    from response_cache import ResponseCache
+
+    db = AsyncMongoMockClient(tz_aware=True)["test"]
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server.sync_queue, "collection", db.sync_jobs)
+    monkeypatch.setattr(server.insights_service, "collection", db.insights_cache)
+    cache = server.github_service.cache
+    monkeypatch.setattr(server.github_service, "cache", ResponseCache(cache.max_entries, cache.max_bytes))
+    server.overview_cache.clear()
+    server.user_cache.clear()
+    return db
+
+
+class GitHubRepository:
+    """A fake GitHub repository with its user and repository documents stored"""
+
+    def __init__(self, fake, user_id: str, repo_id: str):
+        self.fake = fake
+        self.user_id = user_id
+        self.repo_id = repo_id
+
+    @property
+    def calls(self):
+        return self.fake.calls
+
+    def sync(self):
+        import server
+
+        self.fake.reset_stats()
+        return asyncio.run(server.sync_repository_data(self.repo_id, self.user_id))
+
+
+@pytest.fixture
+def github(server_db, monkeypatch):
+    """fake_github serving one repository of 50 commits and 250 pull requests to the server"""
+    import httpx
+
+    import server
+    from fake_github import FakeGitHub
+
+    fake = FakeGitHub(commits=50, prs=250)
+    monkeypatch.setattr(server.github_service, "BASE_URL", "http://github.test")
+    monkeypatch.setattr(server.github_service, "commit_fetch_mode", "rest")
+    monkeypatch.setattr(server.github_service, "_client", httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app)))
+
+    user = server.User(email="sync@example.com", name="Sync", github_token="sync-token", github_username="bench")
+    summary = fake.repos["repo-0"].summary()
+    repo = server.Repository(
+        user_id=user.id, github_id=summary["id"], name=summary["name"], full_name=summary["full_name"],
+        owner=summary["owner"]["login"], url=summary["html_url"], is_private=False
+    )
+
+    async def seed():
+        await server_db.users.insert_one(user.model_dump())
+        await server_db.repositories.insert_one(repo.model_dump())
+
+    asyncio.run(seed())
+    return GitHubRepository(fake, user.id, repo.id)
@@ -0,0 +1,55 @@
+import asyncio
+import math
+from datetime import datetime, timezone
+
+import httpx
+
+import analytics_engine
+import server
+
+
+def test_columns_accept_unmigrated_timestamps():
+    aware = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+    docs = [
+        {"timestamp": aware, "author": "ada"},
+        {"timestamp": aware.replace(tzinfo=None), "author": "ada"},
+        {"timestamp": "2024-03-01T12:00:00Z", "author": "bob"},
+        {"timestamp": "2024-03-01T12:00:00", "author": "bob"},
+        {"timestamp": "not a date"},
+        {"timestamp": None},
+        {}
+    ]
+    timestamps = analytics_engine.commit_columns(docs).timestamps
+    assert list(timestamps[:4]) == [aware.timestamp()] * 4
+    assert all(math.isnan(t) for t in timestamps[4:])
+
+    prs = analytics_engine.pr_columns([{"created_at": "2024-03-01T12:00:00Z", "merged_at": "2024-03-02T12:00:00Z"}])
+    assert prs.merged[0] - prs.created[0] == 24 * 3600
+    assert prs.is_merged[0]
+
+
+def test_health_scores_repositories_with_string_timestamps(server_db):
+    user = server.User(email="health@example.com", name="Health").model_dump()
+    repo = server.Repository(user_id=user["id"], github_id=1, name="legacy", full_name="health/legacy", owner="health",
+                             url="https://github.com/health/legacy", is_private=False).model_dump()
+
+    async def run():
+        await server_db.users.insert_one(dict(user))
+        await server_db.repositories.insert_one(dict(repo))
+        # Written before migrate_datetimes.py ran
+        await server_db.commits.insert_many([
+            {"repository_id": repo["id"], "timestamp": "2024-03-01T12:00:00Z", "author": "ada", "additions": 5},
+            {"repository_id": repo["id"], "timestamp": "garbage", "author": "bob"}
+        ])
+        await server_db.pull_requests.insert_one(
+            {"repository_id": repo["id"], "state": "merged", "created_at": "2024-03-01T12:00:00Z",
+             "merged_at": "2024-03-01T18:00:00Z"}
+        )
+        token = server.create_access_token(server.token_claims(user))
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(f"/api/analytics/health/{repo['id']}", headers={"Authorization": f"Bearer {token}"})
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.json()["repository_id"] == repo["id"]
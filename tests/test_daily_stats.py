@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import daily_stats
+import server
+
+
+def _rows(db, repository_id):
+    rows = asyncio.run(daily_stats.read_rows(db, repository_id))
+    return {row.pop("day"): row for row in rows}
+
+
+def _assert_same_rows(left, right):
+    assert left.keys() == right.keys()
+    for day in left:
+        a, b = dict(left[day]), dict(right[day])
+        assert set(a.pop("authors", [])) == set(b.pop("authors", [])), day
+        assert a.pop("turnaround_hours_sum", 0) == pytest.approx(b.pop("turnaround_hours_sum", 0)), day
+        assert {k: v for k, v in a.items() if v} == {k: v for k, v in b.items() if v}, day
+
+
+def test_rollup_ops_increment_existing_days(server_db):
+    day = datetime(2024, 3, 1, 9, tzinfo=timezone.utc)
+    first = [{"timestamp": day, "author": "ada", "additions": 3, "deletions": 1}]
+    second = [
+        {"timestamp": day + timedelta(hours=5), "author": "bob", "additions": 2, "deletions": 0},
+        {"timestamp": day + timedelta(days=1), "author": "ada", "additions": 1, "deletions": 1}
+    ]
+    pr = {"created_at": day, "merged_at": day + timedelta(hours=6), "additions": 10, "deletions": 5}
+
+    async def apply():
+        await daily_stats.apply_ops(server_db, daily_stats.commit_rollup_ops("r", first))
+        await daily_stats.apply_ops(server_db, daily_stats.commit_rollup_ops("r", second))
+        await daily_stats.apply_ops(server_db, daily_stats.pr_rollup_ops("r", [pr], []))
+        await daily_stats.apply_ops(server_db, daily_stats.pr_rollup_ops("r", [], [pr]))
+
+    asyncio.run(apply())
+    rows = _rows(server_db, "r")
+    today = rows[daily_stats.day_of(day)]
+    assert today["commits"] == 2
+    assert (today["additions"], today["deletions"]) == (5, 1)
+    assert sorted(today["authors"]) == ["ada", "bob"]
+    assert (today["prs_opened"], today["pr_size_sum"]) == (1, 15)
+    assert (today["prs_merged"], today["turnaround_hours_sum"]) == (1, 6)
+    assert rows[daily_stats.day_of(day + timedelta(days=1))]["commits"] == 1
+
+
+def test_incremental_rollup_matches_a_rebuild(github, server_db):
+    # Mark the rollup as built so sync only applies its $inc deltas
+    asyncio.run(server_db.repositories.update_one({"id": github.repo_id}, {"$set": {"daily_stats_ready": True}}))
+    assert github.sync() is True
+
+    # An open PR merges between syncs; the second sync adds only the merge
+    pull = next(p for p in github.fake.repos["repo-0"].pulls if p["state"] == "open")
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    pull.update(state="closed", merged_at=now.strftime("%Y-%m-%dT%H:%M:%SZ"), closed_at=now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                updated_at=(now + timedelta(minutes=1)).strftime("%Y-%m-%dT%H:%M:%SZ"))
+    assert github.sync() is True
+
+    incremental = _rows(server_db, github.repo_id)
+    assert sum(row.get("commits", 0) for row in incremental.values()) == 50
+    assert sum(row.get("prs_opened", 0) for row in incremental.values()) == 250
+
+    asyncio.run(daily_stats.rebuild(server_db, github.repo_id))
+    _assert_same_rows(incremental, _rows(server_db, github.repo_id))
+
+
+def test_rebuild_refuses_unmigrated_timestamps(server_db):
+    day = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+    async def seed():
+        await server_db.repositories.insert_one({"id": "r"})
+        await server_db.commits.insert_one({"repository_id": "r", "timestamp": "2024-03-01T10:00:00Z", "author": "ada"})
+        await daily_stats.apply_ops(server_db, daily_stats.commit_rollup_ops("r", [{"timestamp": day, "author": "ada"}]))
+
+    asyncio.run(seed())
+    with pytest.raises(daily_stats.UnmigratedTimestamps, match="migrate_datetimes.py") as raised:
+        asyncio.run(daily_stats.rebuild(server_db, "r"))
+    assert raised.value.fields == ["commits.timestamp"]
+
+    # The existing rollup is left alone and the repository stays pending
+    assert _rows(server_db, "r")[day]["commits"] == 1
+    assert asyncio.run(server_db.repositories.find_one({"id": "r"})).get("daily_stats_ready") is None
+
+
+def test_sync_survives_unmigrated_timestamps(github, server_db):
+    asyncio.run(server_db.commits.insert_one(
+        {"id": "legacy", "repository_id": github.repo_id, "sha": "legacy", "timestamp": "2020-01-01T00:00:00Z"}
+    ))
+    assert github.sync() is True
+    repo = asyncio.run(server_db.repositories.find_one({"id": github.repo_id}))
+    assert not repo.get("daily_stats_ready")
+
+
+def test_startup_rebuilds_repositories_without_a_rollup(server_db):
+    created = datetime(2024, 3, 1, 8, tzinfo=timezone.utc)
+
+    async def seed():
+        await server_db.repositories.insert_many([{"id": "pending"}, {"id": "ready", "daily_stats_ready": True}])
+        for repository_id in ("pending", "ready"):
+            await server_db.commits.insert_one({"repository_id": repository_id, "timestamp": created, "author": "ada"})
+            await server_db.pull_requests.insert_one(
+                {"repository_id": repository_id, "created_at": created, "merged_at": created + timedelta(hours=2)}
+            )
+
+    asyncio.run(seed())
+    asyncio.run(server.rebuild_pending_rollups())
+
+    row = _rows(server_db, "pending")[created.replace(hour=0)]
+    assert (row["commits"], row["prs_opened"], row["prs_merged"]) == (1, 1, 1)
+    assert row["turnaround_hours_sum"] == pytest.approx(2)
+    assert asyncio.run(server_db.repositories.find_one({"id": "pending"}))["daily_stats_ready"] is True
+    # Repositories that already have a rollup are not rebuilt
+    assert _rows(server_db, "ready") == {}
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+
+from fake_github import FakeGitHub
+from github_service import GitHubService
+
+COMMITS_URL = "http://github.test/repos/bench/repo-0/commits"
+
+
+def collect(commits: int, **budget):
+    """Read the fake's commit listing 10 per page; returns (items, pages, page_state)"""
+    fake = FakeGitHub(commits=commits, prs=0)
+
+    async def run():
+        service = GitHubService()
+        service._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+        state = {}
+        pages = []
+        try:
+            async for page in service.iter_pages("token", COMMITS_URL, {"per_page": 10}, page_state=state, **budget):
+                pages.append(page)
+        finally:
+            await service.close()
+        return sum(len(p) for p in pages), len(pages), state
+
+    return asyncio.run(run())
+
+
+def test_reads_listing_to_the_end():
+    items, pages, state = collect(25)
+    assert (items, pages) == (25, 3)
+    assert state["complete"] is True
+    assert state["etag"]
+
+
+def test_max_pages_cut_is_not_complete():
+    items, pages, state = collect(25, max_pages=2)
+    assert (items, pages) == (20, 2)
+    assert state["complete"] is False
+
+
+def test_max_items_cut_is_not_complete():
+    items, pages, state = collect(25, max_items=15)
+    assert (items, pages) == (15, 2)
+    assert state["complete"] is False
+
+
+def test_budget_that_lands_on_the_last_page_is_complete():
+    assert collect(25, max_pages=3)[2]["complete"] is True
+    assert collect(25, max_items=25)[2]["complete"] is True
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+
+import server
+
+
+def test_health_score_is_reused_until_the_data_version_changes(server_db, monkeypatch):
+    user = server.User(email="health@example.com", name="Health").model_dump()
+    repo = server.Repository(user_id=user["id"], github_id=1, name="scored", full_name="health/scored", owner="health",
+                             url="https://github.com/health/scored", is_private=False).model_dump()
+    computed = []
+    compute = server.compute_repository_health
+
+    async def counting_compute(repo_doc):
+        computed.append(repo_doc.get("data_version", 0))
+        return await compute(repo_doc)
+
+    monkeypatch.setattr(server, "compute_repository_health", counting_compute)
+
+    async def run():
+        await server_db.users.insert_one(dict(user))
+        await server_db.repositories.insert_one(dict(repo))
+        await server_db.commits.insert_one(
+            {"repository_id": repo["id"], "timestamp": datetime.now(timezone.utc), "author": "ada", "additions": 5}
+        )
+        headers = {"Authorization": f"Bearer {server.create_access_token(server.token_claims(user))}"}
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def health():
+                response = await client.get(f"/api/analytics/health/{repo['id']}", headers=headers)
+                assert response.status_code == 200
+                return {field: response.json()[field] for field in server.HEALTH_SCORE_FIELDS}
+
+            async def bump():
+                await server_db.repositories.update_one({"id": repo["id"]}, {"$inc": {"data_version": 1}})
+
+            first = await health()
+            assert await health() == first
+            assert computed == [0]
+
+            # A sync that changed nothing the score depends on revalidates the stored document
+            await bump()
+            assert await health() == first
+            assert computed == [0, 1]
+            assert await server_db.health_scores.count_documents({}) == 1
+
+            # New data moves the score and stores a new document
+            await server_db.commits.insert_one(
+                {"repository_id": repo["id"], "timestamp": datetime.now(timezone.utc), "author": "bob", "additions": 5}
+            )
+            await bump()
+            assert (await health())["collaboration_score"] != first["collaboration_score"]
+            assert computed == [0, 1, 2]
+            assert await server_db.health_scores.count_documents({}) == 2
+            await health()
+            assert computed == [0, 1, 2]
+
+    asyncio.run(run())
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+from fake_github import FakeGitHub
+
+
+@pytest.fixture
+def import_user(server_db, monkeypatch):
+    def with_repos(count):
+        fake = FakeGitHub(repos=count, commits=1, prs=0)
+        monkeypatch.setattr(server.github_service, "BASE_URL", "http://github.test")
+        monkeypatch.setattr(server.github_service, "_client", httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app)))
+        user = server.User(email="import@example.com", name="Import", github_token="import-token", github_username="bench")
+        return fake, user
+
+    return with_repos
+
+
+def test_import_skips_repositories_already_imported(import_user, server_db):
+    # Two pages of 100, with the first repository listed again on the second
+    fake, user = import_user(150)
+    fake.repos["repo-0-again"] = fake.repos["repo-0"]
+
+    async def run():
+        first = await server.import_repositories(current_user=user)
+        again = await server.import_repositories(current_user=user)
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert first["count"] == 150
+    assert again["count"] == 0
+    assert asyncio.run(server_db.repositories.count_documents({})) == 150
+    # Every imported repository got one sync job
+    assert asyncio.run(server_db.sync_jobs.count_documents({})) == 150
+
+
+def test_import_drops_duplicates_within_a_listing(import_user, server_db):
+    fake, user = import_user(2)
+    # The same repository listed twice, as forks and org membership can cause
+    fake.repos["repo-0-again"] = fake.repos["repo-0"]
+
+    result = asyncio.run(server.import_repositories(current_user=user))
+    assert result["count"] == 2
+    names = asyncio.run(server_db.repositories.distinct("name"))
+    assert sorted(names) == ["repo-0", "repo-1"]
+    assert asyncio.run(server_db.repositories.count_documents({})) == 2
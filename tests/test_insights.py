@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from insights import InsightsService, StubProvider
+
+
+def _service(provider):
+    return InsightsService(AsyncMongoMockClient()["test"].insights_cache, provider)
+
+
+def test_concurrent_requests_share_one_generation():
+    provider = StubProvider(delay=0.001)
+    service = _service(provider)
+
+    async def run():
+        results = await asyncio.gather(*(service.generate(f"session-{i}", "summary", "prompt") for i in range(5)))
+        again = await service.generate("session-5", "summary", "prompt")
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert provider.calls == 1
+    assert len({r["insights"] for r in results}) == 1
+    assert not any(r["cached"] for r in results)
+    assert again["cached"] and again["insights"] == results[0]["insights"]
+
+
+def test_disconnecting_client_does_not_cancel_the_generation():
+    provider = StubProvider(delay=0.001)
+    service = _service(provider)
+
+    async def run():
+        early = service.stream("early", "summary", "prompt")
+        await early.__anext__()
+        waiting = asyncio.create_task(service.generate("late", "summary", "prompt"))
+        await early.aclose()
+        return await waiting
+
+    result = asyncio.run(run())
+    assert provider.calls == 1
+    assert result["insights"].startswith("Stub insights")
+
+
+def test_generation_errors_reach_every_waiter():
+    class FailingProvider(StubProvider):
+        async def stream(self, session_id, prompt):
+            self.calls += 1
+            yield "partial "
+            await asyncio.sleep(0.001)
+            raise RuntimeError("model unavailable")
+
+    provider = FailingProvider()
+    service = _service(provider)
+
+    async def run():
+        return await asyncio.gather(
+            *(service.generate(f"session-{i}", "summary", "prompt") for i in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert provider.calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # Nothing was cached, so the next request tries again
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.generate("retry", "summary", "prompt"))
+    assert provider.calls == 2
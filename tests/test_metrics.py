@@ -0,0 +1,36 @@
+import asyncio
+
+import httpx
+
+import metrics
+
+
+def get_metrics(token=None):
+    import server
+
+    async def run():
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/metrics", headers=headers)
+
+    return asyncio.run(run())
+
+
+def test_metrics_are_disabled_without_a_token(server_db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "METRICS_TOKEN", "")
+    assert get_metrics("anything").status_code == 404
+
+
+def test_metrics_require_the_operator_token(server_db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-secret")
+    metrics.SYNC_LAST_DURATION.set(1.5, repository="repo-under-test")
+    assert get_metrics().status_code == 403
+    assert get_metrics("wrong").status_code == 403
+    response = get_metrics("scrape-secret")
+    assert response.status_code == 200
+    assert 'sync_last_duration_seconds{repository="repo-under-test"} 1.5' in response.text
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import mongomock
+import pytest
+
+from pagination import after_key, decode_cursor, encode_cursor
+
+SORT = [("timestamp", -1), ("sha", -1)]
+
+
+def test_cursor_round_trips_datetimes_and_scalars():
+    values = [datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), "abc123", 7]
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 3) == values
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor!", encode_cursor([1]), "e30"])
+def test_decode_rejects_malformed_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 2)
+
+
+def test_after_key_single_field():
+    assert after_key([("github_id", 1)], [5]) == {"github_id": {"$gt": 5}}
+
+
+def test_after_key_breaks_ties_on_later_fields():
+    when = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert after_key(SORT, [when, "b"]) == {"$or": [
+        {"timestamp": {"$lt": when}},
+        {"timestamp": when, "sha": {"$lt": "b"}}
+    ]}
+
+
+def test_paging_visits_every_row_once_in_order():
+    collection = mongomock.MongoClient().db.commits
+    start = datetime(2024, 1, 1)
+    # Three rows per timestamp, so pages split ties
+    collection.insert_many([
+        {"timestamp": start + timedelta(hours=i // 3), "sha": f"{i:04x}"} for i in range(20)
+    ])
+    expected = [(d["timestamp"], d["sha"]) for d in collection.find({}).sort(SORT)]
+
+    seen, cursor = [], None
+    while True:
+        query = after_key(SORT, decode_cursor(cursor, 2)) if cursor else {}
+        page = list(collection.find(query).sort(SORT).limit(7))
+        seen.extend((d["timestamp"], d["sha"]) for d in page)
+        if len(page) < 7:
+            break
+        cursor = encode_cursor([page[-1]["timestamp"], page[-1]["sha"]])
+    assert seen == expected
+
+
+def test_repositories_page_in_insertion_order(server_db):
+    import server
+
+    user = server.User(email="pager@example.com", name="Pager").model_dump()
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # uuid4 ids are random, so id order would shuffle these; two share a created_at
+    names = [f"repo-{i}" for i in range(5)]
+    repos = [
+        server.Repository(user_id=user["id"], github_id=i, name=name, full_name=f"pager/{name}", owner="pager",
+                          url=f"https://github.com/pager/{name}", is_private=False,
+                          created_at=start + timedelta(minutes=min(i, 3))).model_dump()
+        for i, name in enumerate(names)
+    ]
+
+    async def run():
+        await server_db.users.insert_one(dict(user))
+        await server_db.repositories.insert_many([dict(r) for r in reversed(repos)])
+        token = server.create_access_token(server.token_claims(user))
+        seen, cursor = [], None
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            while True:
+                params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+                response = await client.get("/api/repositories", params=params, headers={"Authorization": f"Bearer {token}"})
+                assert response.status_code == 200
+                seen.extend(r["name"] for r in response.json())
+                cursor = response.headers.get("X-Next-Cursor")
+                if not cursor:
+                    return seen
+
+    expected = [r["name"] for r in sorted(repos, key=lambda r: (r["created_at"], r["id"]))]
+    assert asyncio.run(run()) == expected
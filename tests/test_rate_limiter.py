@@ -0,0 +1,52 @@
+import time
+
+import httpx
+
+from rate_limiter import BACKGROUND, INTERACTIVE, RateLimitScheduler
+
+
+def response(status: int = 200, **headers) -> httpx.Response:
+    return httpx.Response(status, headers={k.replace("_", "-"): str(v) for k, v in headers.items()})
+
+
+def test_unknown_budget_does_not_wait():
+    scheduler = RateLimitScheduler()
+    assert scheduler.wait_time("token", BACKGROUND) == 0
+
+
+def test_record_reads_rate_limit_headers():
+    scheduler = RateLimitScheduler()
+    scheduler.record("token", response(x_ratelimit_limit=5000, x_ratelimit_remaining=4321, x_ratelimit_reset=1700000000))
+    budget = scheduler.budget("token")
+    assert (budget.limit, budget.remaining, budget.reset_at) == (5000, 4321, 1700000000.0)
+
+
+def test_background_waits_at_the_reserve_but_interactive_does_not():
+    scheduler = RateLimitScheduler(reserve=100)
+    reset = time.time() + 600
+    scheduler.record("token", response(x_ratelimit_remaining=100, x_ratelimit_reset=reset))
+    assert 590 < scheduler.wait_time("token", BACKGROUND) <= 600
+    assert scheduler.wait_time("token", INTERACTIVE) == 0
+
+
+def test_exhausted_budget_blocks_everyone_until_reset():
+    scheduler = RateLimitScheduler(reserve=0)
+    reset = time.time() + 300
+    scheduler.record("token", response(403, x_ratelimit_remaining=0, x_ratelimit_reset=reset))
+    assert 290 < scheduler.wait_time("token", INTERACTIVE) <= 300
+
+
+def test_retry_after_blocks_the_token():
+    scheduler = RateLimitScheduler()
+    scheduler.record("token", response(429, retry_after=30))
+    assert 25 < scheduler.wait_time("token", INTERACTIVE) <= 30
+    assert scheduler.wait_time("other-token", INTERACTIVE) == 0
+
+
+def test_resources_keep_separate_budgets():
+    scheduler = RateLimitScheduler(reserve=100)
+    reset = time.time() + 600
+    scheduler.record("token", response(x_ratelimit_remaining=10, x_ratelimit_reset=reset, x_ratelimit_resource="graphql"))
+    scheduler.record("token", response(x_ratelimit_remaining=4000, x_ratelimit_reset=reset, x_ratelimit_resource="core"))
+    assert scheduler.wait_time("token", BACKGROUND, "graphql") > 590
+    assert scheduler.wait_time("token", BACKGROUND, "core") == 0
@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+
+from fake_github import FakeGitHub
+from github_service import GitHubService
+from response_cache import ResponseCache
+
+BASE = "http://github.test"
+
+
+def service_for(fake: FakeGitHub) -> GitHubService:
+    service = GitHubService()
+    service.BASE_URL = BASE
+    service._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    return service
+
+
+def test_not_modified_is_replayed_from_the_cache():
+    fake = FakeGitHub(commits=5, prs=0)
+
+    async def run():
+        service = service_for(fake)
+        try:
+            first = await service._get("token", f"{BASE}/repos/bench/repo-0")
+            second = await service._get("token", f"{BASE}/repos/bench/repo-0")
+        finally:
+            await service.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert fake.calls["repo"] == 1
+    assert fake.calls["not_modified"] == 1
+
+
+def test_caller_validators_get_the_raw_304():
+    fake = FakeGitHub(commits=5, prs=0)
+
+    async def run():
+        service = service_for(fake)
+        try:
+            first = await service._get("token", f"{BASE}/repos/bench/repo-0")
+            return await service._get("token", f"{BASE}/repos/bench/repo-0", headers={"If-None-Match": first.headers["ETag"]})
+        finally:
+            await service.close()
+
+    assert asyncio.run(run()).status_code == 304
+
+
+def test_sync_listings_and_commit_details_are_not_cached():
+    fake = FakeGitHub(commits=250, prs=0)
+
+    async def run():
+        service = service_for(fake)
+        try:
+            # The sync tracks its own ETag, so none of its pages are cached
+            async for _ in service.iter_repo_commits("token", "bench", "repo-0", page_state={"etag": None}):
+                pass
+            sha = fake.repos["repo-0"].commits[0]["sha"]
+            await service.get_commit_details("token", "bench", "repo-0", sha)
+            synced = len(service.cache._entries)
+            # An untracked listing keeps its first page only
+            async for _ in service.iter_repo_commits("token", "bench", "repo-0"):
+                pass
+            return synced, len(service.cache._entries)
+        finally:
+            await service.close()
+
+    assert asyncio.run(run()) == (0, 1)
+
+
+def test_memory_tier_is_bounded_by_body_bytes():
+    async def run():
+        cache = ResponseCache(max_entries=100, max_bytes=1000)
+        for i in range(5):
+            await cache.set(f"key-{i}", {"ETag": f'"{i}"'}, b"x" * 400)
+        await cache.set("too-big", {"ETag": '"big"'}, b"x" * 1001)
+        return cache
+
+    cache = asyncio.run(run())
+    assert list(cache._entries) == ["key-3", "key-4"]
+    assert cache._bytes == 800
+    assert asyncio.run(cache.get("key-0")) is None
+    assert asyncio.run(cache.get("too-big")) is None
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+
+def test_incremental_sync_stops_at_the_pull_request_watermark(github, server_db):
+    assert github.sync() is True
+    assert github.calls["pulls"] == 3
+
+    # One PR changes; it sorts first by updated_at and everything after it is older than the watermark
+    pull = github.fake.repos["repo-0"].pulls[-1]
+    pull["updated_at"] = (datetime.now(timezone.utc) + timedelta(minutes=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    pull["title"] = "Retitled"
+
+    assert github.sync() is True
+    assert github.calls["pulls"] == 1
+    stored = asyncio.run(server_db.pull_requests.find_one({"github_id": pull["id"]}))
+    assert stored["title"] == "Retitled"
+
+
+def test_unchanged_repository_resyncs_without_listing_bodies(github):
+    assert github.sync() is True
+    # The first incremental sync adds since= to the commit listing, so its ETag is new
+    assert github.sync() is True
+    assert github.sync() is True
+    assert github.calls["commits"] == 0
+    assert github.calls["commit"] == 0
+    assert github.calls["pulls"] == 0
+    assert github.calls["not_modified"] == 2
+
+
+def test_merge_is_rolled_up_once_on_the_merge_day(server_db):
+    import daily_stats
+    import server
+
+    opened = {"id": 8001, "number": 1, "state": "open", "created_at": "2024-03-01T10:00:00Z", "merged_at": None}
+    merged = {**opened, "state": "closed", "merged_at": "2024-03-03T16:00:00Z"}
+
+    async def run():
+        await server.store_pull_requests("repo", [opened])
+        await server.store_pull_requests("repo", [merged])
+        # Seeing the merged PR again, e.g. on the next poll, adds nothing
+        await server.store_pull_requests("repo", [merged])
+        return {row["day"].day: row for row in await daily_stats.read_rows(server_db, "repo")}
+
+    rows = asyncio.run(run())
+    assert rows[1]["prs_opened"] == 1
+    assert rows[1].get("prs_merged", 0) == 0
+    assert rows[3]["prs_merged"] == 1
+    assert rows[3]["turnaround_hours_sum"] == 54
+    stored = asyncio.run(server_db.pull_requests.find_one({"github_id": 8001}))
+    assert stored["state"] == "closed"
+
+
+def test_pull_request_first_seen_merged_is_opened_and_merged(server_db):
+    import daily_stats
+    import server
+
+    pr = {"id": 8002, "number": 2, "state": "closed", "created_at": "2024-03-01T10:00:00Z", "merged_at": "2024-03-01T12:00:00Z"}
+
+    async def run():
+        await server.store_pull_requests("repo", [pr])
+        await server.store_pull_requests("repo", [pr])
+        return await daily_stats.read_rows(server_db, "repo")
+
+    (row,) = asyncio.run(run())
+    assert (row["prs_opened"], row["prs_merged"], row["turnaround_hours_sum"]) == (1, 1, 2)
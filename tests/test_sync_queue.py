@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from sync_queue import DONE, FAILED, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, QUEUED, RUNNING, SyncQueue
+
+
+class Jobs:
+    """A mongomock collection whose find_one_and_update returns the updated document.
+
+    mongomock re-runs the original filter to fetch the AFTER document when the
+    projection drops ``_id``, so it hands back another (or no) match. The
+    partial unique indexes are left out too: mongomock ignores their filters.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def find_one_and_update(self, filter, update, projection=None, **kwargs):
+        doc = await self._collection.find_one_and_update(filter, update, **kwargs)
+        if doc is not None and projection and projection.get("_id") == 0:
+            doc.pop("_id", None)
+        return doc
+
+
+def run(test):
+    async def main():
+        collection = AsyncMongoMockClient(tz_aware=True)["test"].sync_jobs
+        await test(SyncQueue(Jobs(collection), max_attempts=2, retry_base_seconds=30), collection)
+    asyncio.run(main())
+
+
+def test_duplicate_requests_coalesce_into_one_job():
+    async def test(queue, jobs):
+        first = await queue.enqueue("repo", "user", PRIORITY_BACKGROUND, delay=60)
+        second = await queue.enqueue("repo", "user", PRIORITY_INTERACTIVE)
+        assert second["id"] == first["id"]
+        assert second["priority"] == PRIORITY_INTERACTIVE
+        assert second["run_after"] < first["run_after"]
+        assert await jobs.count_documents({}) == 1
+    run(test)
+
+
+def test_enqueue_many_reports_only_new_jobs():
+    async def test(queue, jobs):
+        await queue.enqueue("a", "user")
+        assert await queue.enqueue_many([("a", "user", 0), ("b", "user", 0), ("c", "user", 10)]) == 2
+        assert await queue.depth() == 3
+    run(test)
+
+
+def test_claim_takes_the_most_urgent_due_job():
+    async def test(queue, jobs):
+        await queue.enqueue("later", "user", PRIORITY_INTERACTIVE, delay=60)
+        await queue.enqueue("background", "user", PRIORITY_BACKGROUND)
+        await queue.enqueue("interactive", "user", PRIORITY_INTERACTIVE)
+        job = await queue.claim("worker")
+        assert job["repository_id"] == "interactive"
+        assert (job["status"], job["lease_owner"], job["attempts"]) == (RUNNING, "worker", 1)
+        assert (await queue.claim("worker"))["repository_id"] == "background"
+        assert await queue.claim("worker") is None
+    run(test)
+
+
+def test_claim_skips_repositories_that_are_running():
+    async def test(queue, jobs):
+        await queue.enqueue("repo", "user")
+        running = await queue.claim("first")
+        await queue.enqueue("repo", "user", PRIORITY_INTERACTIVE)
+        assert await queue.claim("second") is None
+        await queue.complete(running, "first")
+        assert (await queue.claim("second"))["lease_owner"] == "second"
+    run(test)
+
+
+def test_claim_takes_over_an_expired_lease():
+    async def test(queue, jobs):
+        await queue.enqueue("repo", "user")
+        job = await queue.claim("crashed")
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await jobs.update_one({"id": job["id"]}, {"$set": {"lease_expires_at": past}})
+        retaken = await queue.claim("worker")
+        assert (retaken["id"], retaken["lease_owner"], retaken["attempts"]) == (job["id"], "worker", 2)
+    run(test)
+
+
+def test_fail_retries_with_backoff_then_gives_up():
+    async def test(queue, jobs):
+        await queue.enqueue("repo", "user")
+        job = await queue.claim("worker")
+        await queue.fail(job, "worker", "boom")
+        retry = await jobs.find_one({"id": job["id"]})
+        assert (retry["status"], retry["last_error"]) == (QUEUED, "boom")
+        assert retry["run_after"] > datetime.now(timezone.utc) + timedelta(seconds=25)
+        assert "lease_expires_at" not in retry
+
+        await jobs.update_one({"id": job["id"]}, {"$set": {"run_after": datetime.now(timezone.utc)}})
+        job = await queue.claim("worker")
+        assert job["attempts"] == 2
+        await queue.fail(job, "worker", "boom again")
+        failed = await jobs.find_one({"id": job["id"]})
+        assert failed["status"] == FAILED
+        assert "finished_at" in failed
+    run(test)
+
+
+def test_settling_needs_the_lease():
+    async def test(queue, jobs):
+        await queue.enqueue("repo", "user")
+        job = await queue.claim("owner")
+        await queue.complete(job, "someone-else")
+        assert (await jobs.find_one({"id": job["id"]}))["status"] == RUNNING
+        await queue.complete(job, "owner")
+        assert (await jobs.find_one({"id": job["id"]}))["status"] == DONE
+    run(test)
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+from webhooks import parse_payload, verify_signature
+
+SECRET = "webhook-secret"
+BODY = b'{"zen": "Keep it logically awesome."}'
+
+
+def sign(body: bytes, secret: str = SECRET) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_accepts_matching_signature():
+    assert verify_signature(SECRET, BODY, sign(BODY))
+
+
+@pytest.mark.parametrize("signature", [
+    None,
+    "",
+    sign(BODY, "other-secret"),
+    sign(BODY + b" "),
+    sign(BODY).replace("sha256=", "sha1="),
+])
+def test_rejects_bad_signatures(signature):
+    assert not verify_signature(SECRET, BODY, signature)
+
+
+def test_rejects_everything_without_a_secret():
+    assert not verify_signature("", BODY, sign(BODY, ""))
+
+
+def test_parses_json_and_form_encoded_payloads():
+    payload = {"repository": {"id": 42}}
+    assert parse_payload(json.dumps(payload).encode(), "application/json") == payload
+    form = urlencode({"payload": json.dumps(payload)}).encode()
+    assert parse_payload(form, "application/x-www-form-urlencoded") == payload
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (b"{", "application/json"),
+    (b"[1, 2]", "application/json"),
+    (b"other=1", "application/x-www-form-urlencoded"),
+])
+def test_rejects_malformed_payloads(body, content_type):
+    with pytest.raises(ValueError):
+        parse_payload(body, content_type)
+
+
+def test_polled_pull_request_keeps_webhook_sizes(server_db):
+    import server
+
+    webhook_pr = {
+        "id": 7001, "number": 1, "title": "Add feature", "state": "open", "user": {"login": "dev"},
+        "created_at": "2024-03-01T10:00:00Z", "updated_at": "2024-03-01T10:00:00Z",
+        "additions": 120, "deletions": 30, "changed_files": 4, "comments": 3
+    }
+    # The REST list endpoint leaves out sizes and comment counts
+    polled_pr = {key: value for key, value in webhook_pr.items()
+                 if key not in ("additions", "deletions", "changed_files", "comments")}
+    polled_pr.update({"state": "closed", "updated_at": "2024-03-02T10:00:00Z"})
+
+    async def run():
+        await server.store_pull_requests("repo", [webhook_pr])
+        await server.store_pull_requests("repo", [polled_pr])
+        stored = await server_db.pull_requests.find_one({"github_id": 7001})
+        rollup = await server_db.repo_daily_stats.find_one({"repository_id": "repo"})
+        return stored, rollup
+
+    stored, rollup = asyncio.run(run())
+    assert stored["state"] == "closed"
+    assert (stored["additions"], stored["deletions"], stored["changed_files"], stored["comments"]) == (120, 30, 4, 3)
+    assert rollup["pr_size_sum"] == stored["additions"] + stored["deletions"]
+
+
+def test_polled_pull_request_defaults_missing_sizes(server_db):
+    import server
+
+    async def run():
+        await server.store_pull_requests("repo", [{"id": 7002, "number": 2, "created_at": "2024-03-01T10:00:00Z"}])
+        return await server_db.pull_requests.find_one({"github_id": 7002})
+
+    stored = asyncio.run(run())
+    assert (stored["additions"], stored["deletions"], stored["changed_files"], stored["comments"]) == (0, 0, 0, 0)